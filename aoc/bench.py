@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+"""
+Benchmark harness for the dayN/partM solutions
+
+Times the parse and solve phases separately with a monotonic clock, over a
+number of warmup and measured repeats, and keeps a JSON history so every run
+can be compared against a stored baseline.
+
+    python -m aoc.bench day5/part2 -f day5/input/part1.txt -n 10
+    python -m aoc.bench day5/part2 -e sparse
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import statistics
+import time
+from datetime import datetime
+from pathlib import Path
+
+from aoc.solutions import REPO_ROOT, find_solutions, load_solution
+
+DEFAULT_HISTORY_FILE = REPO_ROOT / "bench_history.json"
+# Runs kept per solution/input pair in the history file
+HISTORY_LIMIT = 100
+PHASES = ('parse', 'solve')
+
+
+def percentile(samples, pct):
+    # Nearest-rank percentile
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def summarize(samples):
+    return {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'p95': percentile(samples, 95),
+    }
+
+def time_solution(module, filepath, warmup, repeat, engine=None):
+    samples = {phase: [] for phase in PHASES}
+    options = {'engine': engine} if engine else {}
+    answer = None
+    for i in range(warmup + repeat):
+        # Solutions print as they go; keep that out of the report
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            started = time.perf_counter_ns()
+            parsed = module.parse_file(filepath, **options)
+            parsed_at = time.perf_counter_ns()
+            answer = module.solve(parsed, **options)
+            solved_at = time.perf_counter_ns()
+        if i >= warmup:
+            samples['parse'].append((parsed_at - started) / 1e9)
+            samples['solve'].append((solved_at - parsed_at) / 1e9)
+    return answer, {phase: summarize(s) for phase, s in samples.items()}
+
+def load_history(path):
+    if not Path(path).exists():
+        return {}
+    with open(path, "r") as fh:
+        return json.load(fh)
+
+def save_history(path, history):
+    with open(path, "w") as fh:
+        json.dump(history, fh, indent=2, sort_keys=True)
+
+def history_key(name, filepath, engine=None):
+    filepath = Path(filepath).resolve()
+    if filepath.is_relative_to(REPO_ROOT):
+        filepath = filepath.relative_to(REPO_ROOT)
+    key = f"{name} {filepath}"
+    return f"{key} -e {engine}" if engine else key
+
+def check_engine(name, module, engine):
+    if engine and engine not in getattr(module, 'ENGINES', ()):
+        print(f"Error: {name} has no {engine!r} engine.")
+        exit(1)
+
+def format_duration(seconds):
+    if seconds >= 1:
+        return f"{seconds:.3f}s"
+    return f"{seconds * 1000:.3f}ms"
+
+def main(args):
+    names = args.solutions or find_solutions()
+    history = load_history(args.history)
+    regressions = []
+    for name in names:
+        check_engine(name, load_solution(name), args.engine)
+
+    print(f"{'solution':<12} {'phase':<6} {'min':>12} {'median':>12} {'p95':>12} {'baseline':>12} {'change':>8}")
+    for name in names:
+        module = load_solution(name)
+        filepath = args.file or module.DEFAULT_INPUT_FILE
+        answer, stats = time_solution(module, filepath, args.warmup, args.repeat, args.engine)
+
+        entry = history.setdefault(history_key(name, filepath, args.engine), {'runs': []})
+        baseline = entry.get('baseline')
+        for phase in PHASES:
+            current = stats[phase]
+            base_text = change_text = ""
+            if baseline:
+                base_median = baseline[phase]['median']
+                base_text = format_duration(base_median)
+                if base_median > 0:
+                    change = current['median'] / base_median - 1
+                    change_text = f"{change:+.1%}"
+                    if change > args.threshold:
+                        change_text += " !"
+                        regressions.append((name, phase, change))
+            print(f"{name:<12} {phase:<6} {format_duration(current['min']):>12} {format_duration(current['median']):>12} "
+                  f"{format_duration(current['p95']):>12} {base_text:>12} {change_text:>8}")
+
+        entry['runs'] = (entry['runs'] + [{'at': datetime.now().isoformat(), 'answer': str(answer), **stats}])[-HISTORY_LIMIT:]
+        if not baseline or args.rebaseline:
+            entry['baseline'] = stats
+
+    save_history(args.history, history)
+
+    for name, phase, change in regressions:
+        print(f"Regression: {name} {phase} median is {change:.1%} slower than baseline.")
+    if regressions:
+        exit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark dayN/partM solutions.")
+    parser.add_argument('solutions', nargs='*', help="Solutions to run, like day5/part2, default: all of them")
+    parser.add_argument('-f', '--file', help="Input file, default: each solution's own default input")
+    parser.add_argument('-e', '--engine', help="Engine to time, default: each solution's default engine")
+    parser.add_argument('-w', '--warmup', help="Untimed warmup runs, default: 1", type=int, default=1)
+    parser.add_argument('-n', '--repeat', help="Timed runs, default: 5", type=int, default=5)
+    parser.add_argument('--history', help=f"History file, default: {DEFAULT_HISTORY_FILE}", default=DEFAULT_HISTORY_FILE)
+    parser.add_argument('--threshold', help="Median slowdown flagged as a regression, default: 0.1", type=float, default=0.1)
+    parser.add_argument('--rebaseline', help="Store this run as the new baseline", default=False, action="store_true")
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,139 @@
+"""
+Content-addressed cache of solution results
+
+Results are keyed by a hash of the solution's source (plus the shared aoc
+package), the contents of its input files and the options it ran with, so
+any change to code, input or flags is a miss. Entries live as small JSON
+files on local disk and the least recently used ones are evicted once the
+cache grows past its size limit.
+"""
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from aoc.solutions import REPO_ROOT
+
+DEFAULT_CACHE_DIR = REPO_ROOT / ".cache"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+INPUT_INDEX = "inputs.json"
+PACKAGE_DIR = Path(__file__).resolve().parent
+
+
+def write_json(path, value):
+    # Write then rename, so concurrent runs never see half a file
+    tmp = path.with_name(f".{path.name}.{os.getpid()}")
+    with open(tmp, "w") as fh:
+        json.dump(value, fh)
+    os.replace(tmp, path)
+
+class AnswerCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def input_digest(self, filepath):
+        # Hashing big inputs is the slow part of a hit, so digests are
+        # remembered per path until the file's size or mtime changes
+        filepath = Path(filepath).resolve()
+        stat = filepath.stat()
+        index_path = self.directory / INPUT_INDEX
+        try:
+            with open(index_path, "r") as fh:
+                index = json.load(fh)
+        except (FileNotFoundError, ValueError):
+            index = {}
+
+        known = index.get(str(filepath))
+        if known and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return known[2]
+
+        with open(filepath, "rb") as fh:
+            digest = hashlib.file_digest(fh, "blake2b").hexdigest()
+        index[str(filepath)] = [stat.st_size, stat.st_mtime_ns, digest]
+        write_json(index_path, index)
+        return digest
+
+    def key(self, script_path, input_paths, options):
+        h = hashlib.blake2b()
+        for source in [Path(script_path)] + sorted(PACKAGE_DIR.glob("*.py")):
+            h.update(source.read_bytes())
+        for filepath in input_paths:
+            h.update(self.input_digest(filepath).encode())
+        h.update(json.dumps(options, sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    def get(self, key):
+        entry = self.directory / f"{key}.json"
+        try:
+            with open(entry, "r") as fh:
+                value = json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return None
+        # Touching marks the entry as recently used for eviction
+        os.utime(entry)
+        return value
+
+    def put(self, key, value):
+        write_json(self.directory / f"{key}.json", value)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for entry in self.directory.glob("*.json"):
+            if entry.name == INPUT_INDEX:
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+
+class Tee(io.StringIO):
+    # Captures everything written while still passing it through
+    def __init__(self, stream):
+        super().__init__()
+        self.stream = stream
+
+    def write(self, s):
+        self.stream.write(s)
+        return super().write(s)
+
+def input_files(args):
+    files = args.file if isinstance(args.file, list) else [args.file]
+    return [Path(f) for f in files]
+
+def cached_main(main, args, script_path):
+    # Replays a previous run's output when nothing it depends on has changed.
+    # Runs with side effects beyond stdout (rendered images, traces) always run.
+    if args.no_cache or args.verbose or getattr(args, 'render', None):
+        main(args)
+        return
+
+    cache = AnswerCache()
+    options = {k: v for k, v in vars(args).items() if k != 'no_cache'}
+    key = cache.key(script_path, input_files(args), options)
+    hit = cache.get(key)
+    if hit:
+        sys.stdout.write(hit['output'])
+        print(f"[cached result from {hit['at']}, originally took {hit['seconds']:.6f}s]")
+        return
+
+    started = time.perf_counter()
+    tee = Tee(sys.stdout)
+    with contextlib.redirect_stdout(tee):
+        main(args)
+    cache.put(key, {
+        'output': tee.getvalue(),
+        'seconds': time.perf_counter() - started,
+        'at': time.strftime("%Y-%m-%d %H:%M:%S"),
+    })
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+"""
+Deterministic synthetic inputs for scaling studies
+
+Every day's input format has a seeded generator that yields one line at a
+time, so files far larger than memory can be written. --sweep generates a
+series of sizes and times a solution against each of them.
+
+    python -m aoc.generate day5 -n 1000000 --span 1000000 -o vents.txt
+    python -m aoc.generate day1 --sweep 1000 10000 100000 --solution day1/part2
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+from aoc.solutions import load_solution
+
+DEFAULT_SEED = 2021
+
+
+def depths(rng, count, args):
+    # Mostly descending sonar sweep, like the real thing
+    depth = rng.randrange(100, 200)
+    for _ in range(count):
+        depth = max(0, depth + rng.randint(-5, 10))
+        yield str(depth)
+
+def dive_commands(rng, count, args):
+    for _ in range(count):
+        yield f"{rng.choice(('forward', 'up', 'down'))} {rng.randint(1, 9)}"
+
+def diagnostics(rng, count, args):
+    # Words must be distinct for the ratings to be well defined, so scramble
+    # a counter through a random bijection on width-bit ints (odd multiplies
+    # and xorshifts) instead of drawing words that may repeat
+    mask = (1 << args.width) - 1
+    shift = max(1, args.width // 2)
+    a, b, c = rng.getrandbits(args.width) | 1, rng.getrandbits(args.width), rng.getrandbits(args.width) | 1
+    for i in range(count):
+        x = (i * a + b) & mask
+        x ^= x >> shift
+        x = (x * c) & mask
+        x ^= x >> shift
+        yield format(x, f"0{args.width}b")
+
+def bingo(rng, count, args):
+    numbers = list(range(args.span))
+    rng.shuffle(numbers)
+    yield ",".join(map(str, numbers))
+    cells = args.size * args.size
+    for _ in range(count):
+        yield ""
+        board = rng.sample(range(args.span), cells)
+        for r in range(args.size):
+            yield " ".join(f"{n:>2}" for n in board[r*args.size:(r+1)*args.size])
+
+def vents(rng, count, args):
+    max_length = args.max_length or max(1, args.span // 10)
+    made = 0
+    while made < count:
+        x1 = rng.randrange(args.span)
+        y1 = rng.randrange(args.span)
+        length = rng.randint(1, max_length)
+        dx, dy = rng.choice(((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)))
+        x2 = x1 + dx * length
+        y2 = y1 + dy * length
+        if not (0 <= x2 < args.span and 0 <= y2 < args.span):
+            continue
+        made += 1
+        yield f"{x1},{y1} -> {x2},{y2}"
+
+GENERATORS = {
+    'day1': depths,
+    'day2': dive_commands,
+    'day3': diagnostics,
+    'day4': bingo,
+    'day5': vents,
+}
+
+def write_input(day, count, args, fh):
+    rng = random.Random(args.seed)
+    fh.writelines(line + "\n" for line in GENERATORS[day](rng, count, args))
+
+def sweep(args):
+    from aoc.bench import check_engine, format_duration, time_solution
+
+    name = args.solution or f"{args.day}/part1"
+    module = load_solution(name)
+    check_engine(name, module, args.engine)
+    print(f"{'size':>12} {'parse':>12} {'solve':>12} {'items/s':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.sweep:
+            path = Path(tmp) / f"{args.day}-{count}.txt"
+            with open(path, "w") as fh:
+                write_input(args.day, count, args, fh)
+            _, stats = time_solution(module, path, args.warmup, args.repeat, args.engine)
+            parse = stats['parse']['median']
+            solve = stats['solve']['median']
+            rate = count / (parse + solve) if parse + solve else float('inf')
+            print(f"{count:>12} {format_duration(parse):>12} {format_duration(solve):>12} {rate:>14,.0f}")
+            path.unlink()
+
+def main(args):
+    if args.sweep:
+        sweep(args)
+    elif args.output:
+        with open(args.output, "w") as fh:
+            write_input(args.day, args.count, args, fh)
+    else:
+        write_input(args.day, args.count, args, sys.stdout)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate synthetic puzzle inputs.")
+    parser.add_argument('day', choices=sorted(GENERATORS), help="Input format to generate")
+    parser.add_argument('-n', '--count', help="Depths, commands, words, boards or segments to generate, default: 1000", type=int, default=1000)
+    parser.add_argument('-s', '--seed', help=f"Random seed, default: {DEFAULT_SEED}", type=int, default=DEFAULT_SEED)
+    parser.add_argument('-o', '--output', help="Output file, default: stdout")
+    parser.add_argument('--width', help="Diagnostic word width in bits, default: 12", type=int, default=12)
+    parser.add_argument('--size', help="Bingo board size, default: 5", type=int, default=5)
+    parser.add_argument('--span', help="Bingo number range or vent coordinate span, default: 1000", type=int, default=1000)
+    parser.add_argument('--max-length', help="Longest vent segment, default: span / 10", type=int)
+    parser.add_argument('--sweep', help="Time a solution against generated inputs of these sizes", type=int, nargs='+')
+    parser.add_argument('--solution', help="Solution to time in a sweep, default: the day's part1")
+    parser.add_argument('-e', '--engine', help="Engine to time in a sweep, default: the solution's default engine")
+    parser.add_argument('-w', '--warmup', help="Untimed warmup runs per size in a sweep, default: 0", type=int, default=0)
+    parser.add_argument('-r', '--repeat', help="Timed runs per size in a sweep, default: 3", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.day == 'day3' and max(args.sweep or [args.count]) > 1 << args.width:
+        parser.error(f"at most {1 << args.width} distinct {args.width}-bit words can be generated")
+
+    main(args)
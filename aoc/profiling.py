@@ -0,0 +1,65 @@
+"""
+--profile support for the solution scripts
+
+Runs a script's main under cProfile, saves the pstats file and prints the
+top hotspots, then replays parse_file and solve (with the same --engine)
+under tracemalloc to report the peak memory of each phase on its own.
+"""
+
+import contextlib
+import cProfile
+import functools
+import os
+import pstats
+import tracemalloc
+
+# Rows in the hotspot table
+PROFILE_TOP = 15
+
+
+def format_bytes(n):
+    for unit in ("B", "KiB", "MiB"):
+        if n < 1024:
+            return f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}GiB"
+
+def print_hotspots(profiler, top=PROFILE_TOP):
+    stats = pstats.Stats(profiler)
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+    print(f"{'tottime':>10} {'cumtime':>10} {'calls':>10}  function")
+    for (filename, line, func), (_, calls, tottime, cumtime, _) in rows:
+        location = f"{os.path.basename(filename)}:{line}({func})" if line else func
+        print(f"{tottime:>10.4f} {cumtime:>10.4f} {calls:>10}  {location}")
+
+def phase_memory_peaks(parse_file, solve, filepath):
+    # Solutions print as they go; that was already shown by the profiled run
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        tracemalloc.start()
+        try:
+            parsed = parse_file(filepath)
+            parse_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+            solve(parsed)
+            solve_peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return parse_peak, solve_peak
+
+def profile_main(main, args, parse_file, solve, stats_path):
+    profiler = cProfile.Profile()
+    profiler.runcall(main, args)
+    profiler.dump_stats(stats_path)
+
+    print(f"Wrote profile to {stats_path}.")
+    print_hotspots(profiler)
+
+    filepath = args.file[0] if isinstance(args.file, list) else args.file
+    # Replay the engine that was just profiled, not the script's default
+    engine = getattr(args, 'engine', None)
+    if engine:
+        parse_file = functools.partial(parse_file, engine=engine)
+        solve = functools.partial(solve, engine=engine)
+    parse_peak, solve_peak = phase_memory_peaks(parse_file, solve, filepath)
+    label = f" ({engine} engine)" if engine else ""
+    print(f"Peak memory{label}: parse {format_bytes(parse_peak)}, solve {format_bytes(solve_peak)}")
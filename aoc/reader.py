@@ -0,0 +1,106 @@
+"""
+Input readers shared by every day's solutions
+
+Everything here streams or maps the file rather than loading it as a list of
+strings, so peak memory doesn't grow with the size of the input.
+"""
+
+import mmap
+import os
+from contextlib import contextmanager
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Bytes tokenized per numpy pass, bounds tokenize_ints' scratch arrays
+TOKENIZE_CHUNK_BYTES = 1 << 18
+
+def iter_lines(filepath, strip_empty_lines=True):
+    # Lazily yields stripped lines, one at a time
+    with open(filepath, "r") as fh:
+        for line in fh:
+            line = line.strip()
+            if line or not strip_empty_lines:
+                yield line
+
+def file_contents(filepath, strip_empty_lines=True):
+    # For solutions that really do want every line up front
+    return list(iter_lines(filepath, strip_empty_lines))
+
+@contextmanager
+def mapped(filepath):
+    # Read-only mmap of the whole file (empty files map to b"")
+    with open(filepath, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+def iter_mapped_lines(filepath, strip_empty_lines=True):
+    # Yields each line as stripped bytes sliced straight out of the mapping
+    with mapped(filepath) as mm:
+        size = len(mm)
+        start = 0
+        while start < size:
+            end = mm.find(b"\n", start)
+            if end == -1:
+                end = size
+            line = mm[start:end].strip()
+            if line or not strip_empty_lines:
+                yield line
+            start = end + 1
+
+def iter_blocks(filepath):
+    # Yields lists of lines separated by blank lines, like day4's boards
+    block = []
+    for line in iter_lines(filepath, strip_empty_lines=False):
+        if line:
+            block.append(line)
+        elif block:
+            yield block
+            block = []
+    if block:
+        yield block
+
+def tokenize_chunk(data):
+    # Every unsigned integer in a numpy uint8 byte array, plus the offset it starts at
+    digit_pos = np.flatnonzero((data >= ord('0')) & (data <= ord('9')))
+    if not len(digit_pos):
+        return np.empty(0, dtype=np.int64), digit_pos
+    new_run = np.empty(len(digit_pos), dtype=bool)
+    new_run[0] = True
+    new_run[1:] = np.diff(digit_pos) != 1
+    run_starts = np.flatnonzero(new_run)
+    run_ends = np.append(run_starts[1:], len(digit_pos))
+    place = run_ends[np.cumsum(new_run) - 1] - 1 - np.arange(len(digit_pos))
+    digits = (data[digit_pos] - ord('0')).astype(np.int64)
+    return np.add.reduceat(digits * 10**place, run_starts), digit_pos[run_starts]
+
+def tokenize_ints(data, chunk_size=TOKENIZE_CHUNK_BYTES):
+    # tokenize_chunk over fixed-size slices, each cut just past a number, so
+    # its per-digit scratch arrays stay bounded however big the input is. A
+    # cheap first pass counts the numbers so the results are allocated once.
+    bounds = []
+    count = 0
+    start = 0
+    while start < len(data):
+        end = min(start + chunk_size, len(data))
+        while end < len(data) and ord('0') <= data[end] <= ord('9'):
+            end += 1
+        is_digit = (data[start:end] >= ord('0')) & (data[start:end] <= ord('9'))
+        count += int(is_digit[0]) + int(np.count_nonzero(is_digit[1:] & ~is_digit[:-1]))
+        bounds.append((start, end))
+        start = end
+
+    values = np.empty(count, dtype=np.int64)
+    offsets = np.empty(count, dtype=np.int64)
+    filled = 0
+    for start, end in bounds:
+        chunk_values, chunk_offsets = tokenize_chunk(data[start:end])
+        values[filled:filled + len(chunk_values)] = chunk_values
+        offsets[filled:filled + len(chunk_values)] = chunk_offsets + start
+        filled += len(chunk_values)
+    return values, offsets
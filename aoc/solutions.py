@@ -0,0 +1,78 @@
+"""
+Finding and importing the dayN/partM solution scripts as modules
+
+Each script exposes parse_file(filepath) and solve(parsed) alongside its
+command line main(), which is what lets them be driven from here. Scripts
+with an --engine option list them in ENGINES and both functions also take
+an engine keyword.
+"""
+
+import contextlib
+import importlib.util
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+SOLUTION_NAME = re.compile(r'^day(\d+)/part(\d+)$')
+
+
+def parse_name(name):
+    # "day5/part2" (a trailing .py is fine too) -> (5, 2)
+    mobj = SOLUTION_NAME.match(name.removesuffix(".py"))
+    if not mobj:
+        raise ValueError(f"Solutions are named like day5/part2, not {name!r}.")
+    return int(mobj.group(1)), int(mobj.group(2))
+
+def solution_path(name):
+    day, part = parse_name(name)
+    return REPO_ROOT / f"day{day}" / f"part{part}.py"
+
+def find_solutions():
+    names = []
+    for path in REPO_ROOT.glob("day*/part*.py"):
+        name = f"{path.parent.name}/{path.stem}"
+        if SOLUTION_NAME.match(name):
+            names.append(name)
+    return sorted(names, key=parse_name)
+
+def load_solution(name):
+    day, part = parse_name(name)
+    module_name = f"day{day}_part{part}"
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    path = solution_path(name)
+    if not path.exists():
+        raise FileNotFoundError(f"No solution at {path}.")
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    # Registered first so pickling (process pools) can find the module again
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def input_path(name, input_name=None):
+    # A file in the solution's input dir, or the script's own default input
+    if input_name is None:
+        return load_solution(name).DEFAULT_INPUT_FILE
+    return solution_path(name).parent / "input" / input_name
+
+def run_solution(name, input_name=None):
+    # Runs parse_file then solve in this interpreter, returning
+    # (name, answer, parse seconds, solve seconds)
+    module = load_solution(name)
+    filepath = input_path(name, input_name)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        try:
+            parsed = module.parse_file(filepath)
+            parsed_at = time.perf_counter()
+            answer = module.solve(parsed)
+        except Exception as e:
+            parsed_at = time.perf_counter()
+            answer = f"error: {e!r}"
+        solved_at = time.perf_counter()
+    return name, answer, parsed_at - started, solved_at - parsed_at
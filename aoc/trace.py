@@ -0,0 +1,65 @@
+"""
+Leveled tracing for the solution scripts
+
+Trace points fetch an emitter once, outside their hot loop, and only do any
+work when it isn't None:
+
+    debug = trace.at(trace.DEBUG)
+    for turn in turns:
+        if debug:
+            debug("++++ %s ++++", turn)
+
+With tracing off that's a single truth test per point. With it on, events
+are buffered and written to stderr in bulk, with %-formatting deferred
+until the write.
+"""
+
+import atexit
+import sys
+
+INFO = 1
+DEBUG = 2
+# Events held before a bulk write
+BUFFER_EVENTS = 4096
+
+_tracer = None
+
+
+class Tracer:
+    def __init__(self, level, stream=None, buffer_events=BUFFER_EVENTS):
+        self.level = level
+        self.stream = stream
+        self.buffer_events = buffer_events
+        self.events = []
+
+    def emit(self, message, *args):
+        self.events.append((message, args))
+        if len(self.events) >= self.buffer_events:
+            self.flush()
+
+    def flush(self):
+        if not self.events:
+            return
+        stream = self.stream or sys.stderr
+        stream.write("".join((message % args if args else message) + "\n" for message, args in self.events))
+        stream.flush()
+        self.events.clear()
+
+
+def configure(level, stream=None):
+    # level is the -v count: 0 is off, 1 is INFO, 2 or more is DEBUG
+    global _tracer
+    flush()
+    _tracer = Tracer(level, stream) if level else None
+
+def at(level):
+    # An emit function for this level, or None when it's switched off
+    if _tracer is None or _tracer.level < level:
+        return None
+    return _tracer.emit
+
+def flush():
+    if _tracer is not None:
+        _tracer.flush()
+
+atexit.register(flush)
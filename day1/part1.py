@@ -5,17 +5,34 @@ Advent of Code 2021
 """
 
 import argparse
+import sys
 import re
 import math
 import collections
 from pathlib import Path
-from shutil import copyfile
+from shutil import copyfile, copymode
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 SCRIPT_PATH = Path(__file__).resolve()
-DEFAULT_INPUT_FILE = "input/" + SCRIPT_PATH.name.replace(".py", ".txt")
+sys.path.insert(0, str(SCRIPT_PATH.parents[1]))
+from aoc.reader import iter_lines, tokenize_ints
+from aoc import trace
+from aoc.cache import cached_main
+from aoc.profiling import profile_main
+
+DEFAULT_INPUT_FILE = SCRIPT_PATH.parent / "input" / SCRIPT_PATH.name.replace(".py", ".txt")
 STARTED_AT = None
+# Engines, the first is the default
+ENGINES = ('stream', 'numpy')
+# Window sizes for part1 and part2, and the one this part uses by default
+PART_WINDOWS = (1, 3)
+DEFAULT_WINDOW = 1
 
 @dataclass
 class Tile:
@@ -32,35 +49,68 @@ def log_end():
     duration = datetime.now() - STARTED_AT
     print(f"[execution time: {duration}]")
 
-def file_contents(filepath, strip_empty_lines=True):
-    empty_lines = not strip_empty_lines
-    with open(filepath, "r") as fh:
-        lines = [l.strip() for l in fh if (empty_lines or l.strip())]
-    return lines
 
-
-def parse_file(filepath):
-    lines = file_contents(filepath)
+def parse_file(filepath, engine=ENGINES[0]):
+    if engine == 'numpy':
+        return load_depths(filepath)
     things = []
-    for line in lines:
+    for line in iter_lines(filepath):
         things.append(int(line.strip()))
 
     return things
 
+def read_depths(filepath):
+    # Lazily yields depths, never holding more than one line
+    for line in iter_lines(filepath):
+        yield int(line)
+
+def count_increases(depths, window=1):
+    # Consecutive windows share all but one reading, so the later window is
+    # larger exactly when its entering reading beats the one leaving. A ring
+    # buffer of the last `window` readings is all the state that needs.
+    recent = collections.deque(maxlen=window)
+    larger = 0
+    for depth in depths:
+        if len(recent) == window and depth > recent[0]:
+            larger += 1
+        recent.append(depth)
+    return larger
+
+def load_depths(filepath):
+    # One bulk read, then a vectorized parse of the whole file
+    depths, _ = tokenize_ints(np.fromfile(filepath, dtype=np.uint8))
+    return depths
+
+def count_increases_array(depths, window):
+    # Same entering-vs-leaving comparison, done against a shifted copy
+    return int(np.count_nonzero(depths[window:] > depths[:-window]))
+
+def solve(depths, engine=ENGINES[0]):
+    if engine == 'numpy':
+        return count_increases_array(depths, DEFAULT_WINDOW)
+    return count_increases(depths, DEFAULT_WINDOW)
+
 
 def main(args):
     log_start()
     # ---------
 
-    things = parse_file(args.file)
-
-    previous = None
-    larger = 0
-    for t in things:
-        if previous is not None and t > previous:
-            larger += 1
-        previous = t
-    print(f"Larger count: {larger}")
+    for path in args.file:
+        prefix = f"{path}: " if len(args.file) > 1 else ""
+        if args.engine == 'numpy':
+            if np is None:
+                print("Error: The numpy engine requires numpy to be installed.")
+                exit(1)
+            depths = load_depths(path)
+            if args.window is None:
+                part1, part2 = (count_increases_array(depths, w) for w in PART_WINDOWS)
+                print(f"{prefix}part1 = {part1}, part2 = {part2}")
+            else:
+                larger = count_increases_array(depths, args.window)
+                print(f"{prefix}Larger count: {larger}")
+        else:
+            larger = count_increases(read_depths(path), DEFAULT_WINDOW if args.window is None else args.window)
+            print(f"{prefix}Larger count: {larger}")
 
     # ---------
     log_end()
@@ -69,19 +119,31 @@ def main(args):
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--part2', default=False, action="store_true", help="Copy part1 to part2")
-    parser.add_argument('-f', '--file', help='Input file, default: {}'.format(DEFAULT_INPUT_FILE), default=DEFAULT_INPUT_FILE, required=True)
-    parser.add_argument('-v', '--verbose', help="Verbose output", default=False, action="store_true")
+    parser.add_argument('-f', '--file', help='Input file(s), default: {}'.format(DEFAULT_INPUT_FILE), nargs='+', default=[DEFAULT_INPUT_FILE])
+    parser.add_argument('-v', '--verbose', help="Verbose output, repeat for more detail", default=0, action="count")
+    parser.add_argument('--profile', help="Profile main with cProfile and tracemalloc", default=False, action="store_true")
+    parser.add_argument('--no-cache', help="Always recompute instead of replaying a cached result", default=False, action="store_true")
+    parser.add_argument('-w', '--window', help=f"Sliding window size, default: {DEFAULT_WINDOW} (the numpy engine reports both parts' windows unless this is given)", type=int)
+    parser.add_argument('-e', '--engine', help="Depth engine, default: stream", choices=ENGINES, default=ENGINES[0])
     args = parser.parse_args()
+    if args.window is not None and args.window < 1:
+        parser.error("--window must be at least 1")
+    trace.configure(args.verbose)
 
     if args.part2:
         if SCRIPT_PATH.name != "part1.py":
             print("Error: Only part1.py can be copied to part2.py")
             exit(1)
-        part2 = SCRIPT_PATH.replace("part1", "part2")
+        part2 = SCRIPT_PATH.with_name(SCRIPT_PATH.name.replace("part1", "part2"))
         if part2.exists():
-            print("Error: part2.py already exists. Delete first in order to copy part1.py again.")
+            print("Error: part2.py already exists. Delete part2.py first in order to copy again.")
             exit(1)
         copyfile(SCRIPT_PATH, part2)
+        copymode(SCRIPT_PATH, part2)
         print(f"Created {part2}.")
+        exit(0)
 
-    main(args)
\ No newline at end of file
+    if args.profile:
+        profile_main(main, args, parse_file, solve, SCRIPT_PATH.with_suffix(".pstats"))
+    else:
+        cached_main(main, args, SCRIPT_PATH)
\ No newline at end of file
@@ -5,17 +5,34 @@ Advent of Code 2021
 """
 
 import argparse
+import sys
 import re
 import math
 import collections
+from array import array
+import concurrent.futures
+import os
 from pathlib import Path
 from shutil import copyfile, copymode
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 SCRIPT_PATH = Path(__file__).resolve()
+sys.path.insert(0, str(SCRIPT_PATH.parents[1]))
+from aoc.reader import iter_lines, tokenize_ints
+from aoc import trace
+from aoc.cache import cached_main
+from aoc.profiling import profile_main
+
 DEFAULT_INPUT_FILE = SCRIPT_PATH.parent / "input" / SCRIPT_PATH.name.replace(".py", ".txt")
 STARTED_AT = None
+# Engines, the first is the default
+ENGINES = ('serial', 'chunked', 'columnar')
 
 @dataclass
 class Tile:
@@ -32,17 +49,15 @@ def log_end():
     duration = datetime.now() - STARTED_AT
     print(f"[execution time: {duration}]")
 
-def file_contents(filepath, strip_empty_lines=True):
-    empty_lines = not strip_empty_lines
-    with open(filepath, "r") as fh:
-        lines = [l.strip() for l in fh if (empty_lines or l.strip())]
-    return lines
-
 
-def parse_file(filepath):
-    lines = file_contents(filepath)
+def parse_file(filepath, engine=ENGINES[0]):
+    if engine == 'chunked':
+        # The chunk workers read their own byte ranges of the file
+        return filepath
+    if engine == 'columnar':
+        return load_commands(filepath)
     things = []
-    for line in lines:
+    for line in iter_lines(filepath):
         # Parse with regex
         mobj = re.match(r'^(forward|up|down) (\d+)', line)
         if mobj:
@@ -51,14 +66,126 @@ def parse_file(filepath):
     return things
 
 
-def main(args):
-    log_start()
-    # ---------
-
+# -- Columnar commands --
+# Commands as two parallel arrays: a small-int opcode and its value
+FORWARD, UP, DOWN = 0, 1, 2
+OPCODES = {b"forward": FORWARD, b"up": UP, b"down": DOWN}
+
+def tokenize_commands(data):
+    # The first byte of each line is enough to tell the three commands apart
+    first_byte = np.full(256, -1, dtype=np.int8)
+    for name, op in OPCODES.items():
+        first_byte[name[0]] = op
+    starts = np.flatnonzero(data == ord('\n')) + 1
+    if len(data):
+        starts = np.concatenate(([0], starts[starts < len(data)]))
+    ops = first_byte[data[starts]]
+    ops = ops[ops >= 0]
+    values, _ = tokenize_ints(data)
+    if len(ops) != len(values):
+        raise ValueError(f"Found {len(ops)} commands but {len(values)} values.")
+    return ops, values
+
+def load_commands(filepath):
+    if np is not None:
+        return tokenize_commands(np.fromfile(filepath, dtype=np.uint8))
+
+    ops = array('b')
+    values = array('q')
+    with open(filepath, "rb") as fh:
+        for line in fh:
+            parts = line.split()
+            if len(parts) == 2 and parts[0] in OPCODES:
+                ops.append(OPCODES[parts[0]])
+                values.append(int(parts[1]))
+    return ops, values
+
+def summarize_commands(ops, values):
+    # Reduces columnar commands to a (horizontal, depth, aim) summary
+    if np is not None and isinstance(ops, np.ndarray):
+        forward = ops == FORWARD
+        aim = np.cumsum(np.where(ops == DOWN, values, 0) - np.where(ops == UP, values, 0))
+        if not len(aim):
+            return EMPTY_SUMMARY
+        return (int(values[forward].sum()), int((values * aim)[forward].sum()), int(aim[-1]))
+
+    horizontal = depth = aim = 0
+    for op, n in zip(ops, values):
+        if op == FORWARD:
+            horizontal += n
+            depth += aim * n
+        elif op == UP:
+            aim -= n
+        elif op == DOWN:
+            aim += n
+    return (horizontal, depth, aim)
+
+# -- Chunked engine --
+# A run of commands reduces to (horizontal delta, depth delta, aim delta),
+# where the depth delta assumes the run started with zero aim. Part1's depth
+# is exactly the aim, so the same summary answers both parts.
+EMPTY_SUMMARY = (0, 0, 0)
+
+def combine_summaries(first, second):
+    # Forward moves in the second run also dive by the aim the first run built up
+    h1, d1, a1 = first
+    h2, d2, a2 = second
+    return (h1 + h2, d1 + d2 + a1 * h2, a1 + a2)
+
+def chunk_offsets(filepath, chunks):
+    # Byte offsets splitting the file into roughly equal chunks on line boundaries
+    size = os.path.getsize(filepath)
+    offsets = [0]
+    with open(filepath, "rb") as fh:
+        for i in range(1, chunks):
+            fh.seek(max(size * i // chunks - 1, 0))
+            fh.readline()
+            offsets.append(min(fh.tell(), size))
+    offsets.append(size)
+    return sorted(set(offsets))
+
+def reduce_chunk(filepath, start, end):
+    if np is not None:
+        with open(filepath, "rb") as fh:
+            fh.seek(start)
+            data = np.frombuffer(fh.read(end - start), dtype=np.uint8)
+        return summarize_commands(*tokenize_commands(data))
+
+    horizontal = depth = aim = 0
+    with open(filepath, "rb") as fh:
+        fh.seek(start)
+        pos = start
+        while pos < end:
+            line = fh.readline()
+            if not line:
+                break
+            pos += len(line)
+            parts = line.split()
+            if len(parts) != 2:
+                continue
+            d, n = parts[0], int(parts[1])
+            if d == b"forward":
+                horizontal += n
+                depth += aim * n
+            elif d == b"up":
+                aim -= n
+            elif d == b"down":
+                aim += n
+    return (horizontal, depth, aim)
+
+def reduce_file_chunked(filepath, workers=None, chunks=None):
+    chunks = chunks or (workers or os.cpu_count() or 1) * 4
+    offsets = chunk_offsets(filepath, chunks)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        summaries = pool.map(reduce_chunk, [filepath] * (len(offsets) - 1), offsets[:-1], offsets[1:])
+        total = EMPTY_SUMMARY
+        for summary in summaries:
+            total = combine_summaries(total, summary)
+    return total
+
+def dive(things):
     horizontal = 0
     depth = 0
-    things = parse_file(args.file)
-
     for d,n in things:
         if d == "forward":
             horizontal += n
@@ -66,6 +193,28 @@ def main(args):
             depth -= n
         elif d == "down":
             depth += n
+    return horizontal, depth
+
+def position(parsed, engine=ENGINES[0], workers=None):
+    if engine == 'chunked':
+        horizontal, _, depth = reduce_file_chunked(parsed, workers)
+    elif engine == 'columnar':
+        horizontal, _, depth = summarize_commands(*parsed)
+    else:
+        horizontal, depth = dive(parsed)
+    return horizontal, depth
+
+def solve(parsed, engine=ENGINES[0]):
+    horizontal, depth = position(parsed, engine)
+    return horizontal * depth
+
+
+def main(args):
+    log_start()
+    # ---------
+
+    parsed = parse_file(args.file, args.engine)
+    horizontal, depth = position(parsed, args.engine, args.workers)
 
     print(f"Progress = {horizontal}, Depth = {depth}. Answer = {horizontal * depth}")
     
@@ -78,8 +227,13 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--part2', default=False, action="store_true", help="Copy part1 to part2")
     parser.add_argument('-f', '--file', help='Input file, default: {}'.format(DEFAULT_INPUT_FILE), default=DEFAULT_INPUT_FILE)
-    parser.add_argument('-v', '--verbose', help="Verbose output", default=False, action="store_true")
+    parser.add_argument('-v', '--verbose', help="Verbose output, repeat for more detail", default=0, action="count")
+    parser.add_argument('--profile', help="Profile main with cProfile and tracemalloc", default=False, action="store_true")
+    parser.add_argument('--no-cache', help="Always recompute instead of replaying a cached result", default=False, action="store_true")
+    parser.add_argument('-e', '--engine', help="Dive engine, default: serial", choices=ENGINES, default=ENGINES[0])
+    parser.add_argument('--workers', help="Worker processes for the chunked engine, default: one per CPU", type=int)
     args = parser.parse_args()
+    trace.configure(args.verbose)
 
     if args.part2:
         if SCRIPT_PATH.name != "part1.py":
@@ -94,4 +248,7 @@ if __name__ == '__main__':
         print(f"Created {part2}.")
         exit(0)
 
-    main(args)
\ No newline at end of file
+    if args.profile:
+        profile_main(main, args, parse_file, solve, SCRIPT_PATH.with_suffix(".pstats"))
+    else:
+        cached_main(main, args, SCRIPT_PATH)
\ No newline at end of file
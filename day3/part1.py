@@ -5,6 +5,7 @@ Advent of Code 2021
 """
 
 import argparse
+import sys
 import re
 import math
 import collections
@@ -13,7 +14,18 @@ from shutil import copyfile, copymode
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 SCRIPT_PATH = Path(__file__).resolve()
+sys.path.insert(0, str(SCRIPT_PATH.parents[1]))
+from aoc.reader import iter_lines
+from aoc import trace
+from aoc.cache import cached_main
+from aoc.profiling import profile_main
+
 DEFAULT_INPUT_FILE = SCRIPT_PATH.parent / "input" / SCRIPT_PATH.name.replace(".py", ".txt")
 STARTED_AT = None
 
@@ -32,23 +44,38 @@ def log_end():
     duration = datetime.now() - STARTED_AT
     print(f"[execution time: {duration}]")
 
-def file_contents(filepath, strip_empty_lines=True):
-    empty_lines = not strip_empty_lines
-    with open(filepath, "r") as fh:
-        lines = [l.strip() for l in fh if (empty_lines or l.strip())]
-    return lines
-
 
 def parse_file(filepath):
-    lines = file_contents(filepath)
-    return [x.strip() for x in lines]
-
-def main(args):
-    log_start()
-    # ---------
-
-    things = parse_file(args.file)
-
+    if np is not None:
+        return load_bit_matrix(filepath)
+    return list(iter_lines(filepath))
+
+def load_bit_matrix(filepath):
+    # Readings are fixed width, so the file reshapes straight into a
+    # (readings, width) array of 0/1 without touching individual lines
+    data = np.fromfile(filepath, dtype=np.uint8)
+    data = data[data != ord('\r')]
+    # Blank lines are a newline at the start or right after another newline
+    newlines = data == ord('\n')
+    data = data[~(newlines & np.concatenate(([True], newlines[:-1])))]
+    width = int(np.argmax(data == ord('\n'))) if ord('\n') in data else len(data)
+    if width == 0:
+        raise ValueError(f"No readings in {filepath}")
+    if len(data) % (width + 1):
+        data = np.append(data, np.uint8(ord('\n')))
+    if len(data) % (width + 1):
+        raise ValueError(f"Readings in {filepath} are not all {width} bits wide")
+    rows = data.reshape(-1, width + 1)
+    return rows[:, :width] - ord('0')
+
+def gamma_from_bits(bits):
+    freq = bits.sum(axis=0, dtype=np.int64)
+    gamma_num = 0
+    for is_one in freq * 2 > len(bits):
+        gamma_num = (gamma_num << 1) | int(is_one)
+    return gamma_num, bits.shape[1]
+
+def gamma_from_strings(things):
     gamma_bits = ""
     freq = [0]*len(things[0])
     for t in things:
@@ -59,9 +86,22 @@ def main(args):
     for n in freq:
         gamma_bits += '1' if n > len(things) / 2 else '0'
 
-    gamma_num = int(gamma_bits, 2)
-    epsilon_num = gamma_num ^ int('1'*len(gamma_bits), 2)
-    print(f"gamma_num * epsilon_num = {gamma_num * epsilon_num}")
+    return int(gamma_bits, 2), len(gamma_bits)
+
+def solve(things):
+    if np is not None and isinstance(things, np.ndarray):
+        gamma_num, width = gamma_from_bits(things)
+    else:
+        gamma_num, width = gamma_from_strings(things)
+    epsilon_num = gamma_num ^ ((1 << width) - 1)
+    return gamma_num * epsilon_num
+
+def main(args):
+    log_start()
+    # ---------
+
+    things = parse_file(args.file)
+    print(f"gamma_num * epsilon_num = {solve(things)}")
         
 
     # ---------
@@ -72,8 +112,11 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--part2', default=False, action="store_true", help="Copy part1 to part2")
     parser.add_argument('-f', '--file', help='Input file, default: {}'.format(DEFAULT_INPUT_FILE), default=DEFAULT_INPUT_FILE)
-    parser.add_argument('-v', '--verbose', help="Verbose output", default=False, action="store_true")
+    parser.add_argument('-v', '--verbose', help="Verbose output, repeat for more detail", default=0, action="count")
+    parser.add_argument('--profile', help="Profile main with cProfile and tracemalloc", default=False, action="store_true")
+    parser.add_argument('--no-cache', help="Always recompute instead of replaying a cached result", default=False, action="store_true")
     args = parser.parse_args()
+    trace.configure(args.verbose)
 
     if args.part2:
         if SCRIPT_PATH.name != "part1.py":
@@ -88,4 +131,7 @@ if __name__ == '__main__':
         print(f"Created {part2}.")
         exit(0)
 
-    main(args)
\ No newline at end of file
+    if args.profile:
+        profile_main(main, args, parse_file, solve, SCRIPT_PATH.with_suffix(".pstats"))
+    else:
+        cached_main(main, args, SCRIPT_PATH)
\ No newline at end of file
@@ -5,18 +5,30 @@ Advent of Code 2021
 """
 
 import argparse
+import sys
+import bisect
 import re
 import math
 import collections
-from copy import copy
 from pathlib import Path
 from shutil import copyfile, copymode
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # Bad answer: 328329
 
 SCRIPT_PATH = Path(__file__).resolve()
+sys.path.insert(0, str(SCRIPT_PATH.parents[1]))
+from aoc.reader import iter_lines
+from aoc import trace
+from aoc.cache import cached_main
+from aoc.profiling import profile_main
+
 DEFAULT_INPUT_FILE = SCRIPT_PATH.parent / "input" / SCRIPT_PATH.name.replace(".py", ".txt")
 STARTED_AT = None
 
@@ -35,57 +47,96 @@ def log_end():
     duration = datetime.now() - STARTED_AT
     print(f"[execution time: {duration}]")
 
-def file_contents(filepath, strip_empty_lines=True):
-    empty_lines = not strip_empty_lines
-    with open(filepath, "r") as fh:
-        lines = [l.strip() for l in fh if (empty_lines or l.strip())]
-    return lines
 
 
+def load_bit_matrix(filepath):
+    # Readings are fixed width, so the file reshapes straight into a
+    # (readings, width) array of 0/1 without touching individual lines
+    data = np.fromfile(filepath, dtype=np.uint8)
+    data = data[data != ord('\r')]
+    # Blank lines are a newline at the start or right after another newline
+    newlines = data == ord('\n')
+    data = data[~(newlines & np.concatenate(([True], newlines[:-1])))]
+    width = int(np.argmax(data == ord('\n'))) if ord('\n') in data else len(data)
+    if width == 0:
+        raise ValueError(f"No readings in {filepath}")
+    if len(data) % (width + 1):
+        data = np.append(data, np.uint8(ord('\n')))
+    if len(data) % (width + 1):
+        raise ValueError(f"Readings in {filepath} are not all {width} bits wide")
+    rows = data.reshape(-1, width + 1)
+    return rows[:, :width] - ord('0')
+
 def parse_file(filepath):
-    lines = file_contents(filepath)
-    return [x.strip() for x in lines]
-
-def filter_binary_numbers_by_index_freq(nums, index, filter_by_most):
-    one_count = [x[index] for x in nums].count('1')
-    half_nums = len(nums) / 2
-    if one_count == half_nums:
-        filter_num = str(int(filter_by_most))
-    else:
-        most_common = int(one_count > half_nums)
-        least_common = (most_common + 1) % 2
-        filter_num = str(most_common) if filter_by_most else str(least_common)
-    return [n for n in nums if n[index] == filter_num]
+    # Readings as sorted ints; every shared prefix is then a contiguous range
+    if np is not None:
+        bits = load_bit_matrix(filepath)
+        width = bits.shape[1]
+        if width > 64:
+            raise ValueError(f"Readings wider than 64 bits are not supported: {width}")
+        # Pack the bits 8 to a byte, left-aligned in a big-endian uint64 that is
+        # then shifted down, never widening the whole matrix to 8 bytes per bit
+        packed = np.zeros((len(bits), 8), dtype=np.uint8)
+        packed[:, :-(-width // 8)] = np.packbits(bits, axis=1)
+        values = packed.view('>u8').ravel() >> np.uint64(64 - width)
+        values = values.astype(np.uint64)
+        values.sort()
+        return values, width
+
+    things = list(iter_lines(filepath))
+    return sorted(int(t, 2) for t in things), len(things[0])
+
+def first_at_least(values, target, lo, hi):
+    if np is not None and isinstance(values, np.ndarray):
+        return lo + int(np.searchsorted(values[lo:hi], np.uint64(target)))
+    return bisect.bisect_left(values, target, lo, hi)
+
+def find_rating(values, width, filter_by_most):
+    # Walks down one bit at a time like a binary trie: the readings matching
+    # the prefix so far are values[lo:hi], and the ones with the next bit set
+    # start at the bisect point, so both subtree counts come for free.
+    lo, hi = 0, len(values)
+    prefix = 0
+    for i in range(width):
+        if hi - lo == 1:
+            break
+        bit = 1 << (width - 1 - i)
+        split = first_at_least(values, prefix | bit, lo, hi)
+        one_count = hi - split
+        zero_count = split - lo
+        if filter_by_most:
+            take_ones = one_count >= zero_count
+        else:
+            take_ones = one_count < zero_count
+        # Never step into an empty branch
+        if take_ones and one_count or not zero_count:
+            lo = split
+            prefix |= bit
+        else:
+            hi = split
+
+    assert hi - lo == 1
+    return int(values[lo])
+
+def solve(readings):
+    values, width = readings
+    return find_rating(values, width, True) * find_rating(values, width, False)
 
 
 def main(args):
     log_start()
     # ---------
 
-    things = parse_file(args.file)
+    values, width = parse_file(args.file)
+    info = trace.at(trace.INFO)
 
-    # oxygen generator
-    o_nums = copy(things)
-    print(f"starting oxygen process with {len(o_nums)} items...")
-    for i in range(len(things[0])):
-        o_nums = filter_binary_numbers_by_index_freq(o_nums, i, True)
-        if len(o_nums) == 1:
-            break
+    if info:
+        info("starting oxygen process with %d items...", len(values))
+    o_num = find_rating(values, width, True)
 
-    assert len(o_nums) == 1
-
-    # co2 scrubber
-    c_nums = copy(things)
-    print(f"starting co2 process with {len(c_nums)} items...")
-    for i in range(len(things[0])):
-        c_nums = filter_binary_numbers_by_index_freq(c_nums, i, False)
-        if len(c_nums) == 1:
-            break
-
-    assert len(c_nums) == 1
-
-    o_num = int(o_nums[0], 2)
-    c_num = int(c_nums[0], 2)
+    if info:
+        info("starting co2 process with %d items...", len(values))
+    c_num = find_rating(values, width, False)
 
     print(f"{o_num=}, {c_num=}, life support rating = {o_num * c_num}")
 
@@ -97,8 +148,11 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--part2', default=False, action="store_true", help="Copy part1 to part2")
     parser.add_argument('-f', '--file', help='Input file, default: {}'.format(DEFAULT_INPUT_FILE), default=DEFAULT_INPUT_FILE)
-    parser.add_argument('-v', '--verbose', help="Verbose output", default=False, action="store_true")
+    parser.add_argument('-v', '--verbose', help="Verbose output, repeat for more detail", default=0, action="count")
+    parser.add_argument('--profile', help="Profile main with cProfile and tracemalloc", default=False, action="store_true")
+    parser.add_argument('--no-cache', help="Always recompute instead of replaying a cached result", default=False, action="store_true")
     args = parser.parse_args()
+    trace.configure(args.verbose)
 
     if args.part2:
         if SCRIPT_PATH.name != "part1.py":
@@ -113,4 +167,7 @@ if __name__ == '__main__':
         print(f"Created {part2}.")
         exit(0)
 
-    main(args)
\ No newline at end of file
+    if args.profile:
+        profile_main(main, args, parse_file, solve, SCRIPT_PATH.with_suffix(".pstats"))
+    else:
+        cached_main(main, args, SCRIPT_PATH)
\ No newline at end of file
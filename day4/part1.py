@@ -5,71 +5,163 @@ Advent of Code 2021
 """
 
 import argparse
+import sys
 import re
 import math
 import collections
+import itertools
+from array import array
 from pathlib import Path
 from shutil import copyfile, copymode
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 SCRIPT_PATH = Path(__file__).resolve()
+sys.path.insert(0, str(SCRIPT_PATH.parents[1]))
+from aoc.reader import iter_blocks, mapped, tokenize_ints
+from aoc import trace
+from aoc.cache import cached_main
+from aoc.profiling import profile_main
+
 DEFAULT_INPUT_FILE = SCRIPT_PATH.parent / "input" / SCRIPT_PATH.name.replace(".py", ".txt")
 STARTED_AT = None
+# Engines, the first is the default
+ENGINES = ('simulate', 'ranked')
 
 class Board:
-    BOARD_SIZE = 5
+    # A view onto one board in a BoardSet; the set owns all of the state
+    __slots__ = ('board_set', 'index')
 
-    def __init__(self, input_lines):
-        self.board = [re.split(r'\s+', l) for l in input_lines]
-        self.marked = [[False]*Board.BOARD_SIZE for n in range(Board.BOARD_SIZE)]
-        self.winner = False
-        self.lookup = {}
-        self.winning_number = None
-        self._create_lookup()
+    def __init__(self, board_set, index):
+        self.board_set = board_set
+        self.index = index
 
     def __repr__(self):
+        size = self.board_set.size
         lines = []
-        for r in range(len(self.board)):
+        for r in range(size):
             row = []
-            for c in range(len(self.board[0])):
+            for c in range(size):
                 row.append(self._get_val(r, c))
             lines.append(f" ".join(row))
         return "\n".join(lines)
 
     def _get_val(self, r, c):
-        marked = '*' if self.marked[r][c] else ' ' 
-        return f"{self.board[r][c]:>2}{marked}"
-
-    def _create_lookup(self):
-        for r in range(len(self.board)):
-            for c in range(len(self.board[0])):
-                self.lookup[self.board[r][c]] = (r,c)        
-
-    def check_number(self, num):
-        if num in self.lookup:
-            r,c = self.lookup[num]
-            self.marked[r][c] = True
-            if all(self.marked[r]) or all([x[c] for x in self.marked]):
-                self.winning_number = int(num)
-                print(f"Winning number: {num}")
-                print(self)
-                self.winner = True
-        return self.winner
+        bit = r * self.board_set.size + c
+        marked = '*' if self.mask >> bit & 1 else ' '
+        return f"{self.board_set.value(self.index, bit):>2}{marked}"
+
+    @property
+    def mask(self):
+        return self.board_set.marks[self.index]
+
+    @property
+    def winning_number(self):
+        return self.board_set.winning_numbers[self.index]
+
+    @property
+    def winner(self):
+        return self.winning_number is not None
 
     @property
     def score(self):
         if not self.winner:
             raise Exception("This board is not a winner.")
 
-        unmarked_sum = 0
-        for r in range(len(self.board)):
-            for c in range(len(self.board[0])):
-                if not self.marked[r][c]:
-                    unmarked_sum += int(self.board[r][c])
+        return self.board_set.unmarked_sums[self.index] * self.winning_number
+
+
+class BoardSet:
+    # Every board's values live in one shared array and each board's marked
+    # cells are a single int bitmask (bit r*size + c). A number is indexed to
+    # the (board, bit) cells holding it, so a draw only visits the boards that
+    # actually contain it.
+    def __init__(self, size):
+        self.size = size
+        self.values = array('i')
+        self.marks = []
+        self.winning_numbers = []
+        self.unmarked_sums = []
+        self.boards = []
+        self.winner_count = 0
+        self._postings = None
+
+        row_masks = [((1 << size) - 1) << (r * size) for r in range(size)]
+        col_masks = [sum(1 << (r * size + c) for r in range(size)) for c in range(size)]
+        self.line_masks = [(row_masks[bit // size], col_masks[bit % size]) for bit in range(size * size)]
+
+    def add_board(self, rows):
+        for row in rows:
+            self.values.extend(row)
+        self.unmarked_sums.append(sum(map(sum, rows)))
+        self._add_board_state(1)
+
+    def add_boards(self, values):
+        # Bulk load a numpy (boards, size, size) array
+        self.values.frombytes(memoryview(values.astype(np.int32)).cast("B"))
+        self.unmarked_sums.extend(values.reshape(len(values), -1).sum(axis=1).tolist())
+        self._add_board_state(len(values))
+
+    def _add_board_state(self, count):
+        start = len(self.boards)
+        self.marks.extend([0] * count)
+        self.winning_numbers.extend([None] * count)
+        self.boards.extend(Board(self, b) for b in range(start, start + count))
+        self._postings = None
+
+    @property
+    def postings(self):
+        # Built on first use, engines that never draw don't pay for it
+        if self._postings is None:
+            cells = self.size * self.size
+            self._postings = collections.defaultdict(list)
+            for i, num in enumerate(self.values):
+                self._postings[num].append(divmod(i, cells))
+        return self._postings
+
+    def value(self, b, bit):
+        return self.values[b * self.size * self.size + bit]
+
+    def draw(self, num):
+        # Returns the boards this number turned into winners, in board order
+        debug = trace.at(trace.DEBUG)
+        winners = []
+        for b, bit in self.postings.get(num, ()):
+            if self.winning_numbers[b] is not None:
+                continue
+            mask = self.marks[b]
+            if mask >> bit & 1:
+                continue
+            mask |= 1 << bit
+            self.marks[b] = mask
+            self.unmarked_sums[b] -= num
+            row_mask, col_mask = self.line_masks[bit]
+            if mask & row_mask == row_mask or mask & col_mask == col_mask:
+                self.winning_numbers[b] = num
+                self.winner_count += 1
+                board = self.boards[b]
+                if debug:
+                    debug("Winning number: %s\n%s", num, repr(board))
+                winners.append(board)
+        return winners
 
-        return unmarked_sum * self.winning_number
-    
+    def wins(self, turns):
+        # Lazily plays the game, yielding (turn index, board, score) for each
+        # win in order. Stops drawing as soon as the caller stops asking or
+        # every board has won.
+        debug = trace.at(trace.DEBUG)
+        for i, turn in enumerate(turns):
+            if self.winner_count == len(self.boards):
+                return
+            if debug:
+                debug("++++ %s ++++", turn)
+            for board in self.draw(turn):
+                yield i, board, board.score
 
 def log_start():
     global STARTED_AT
@@ -81,53 +173,110 @@ def log_end():
     duration = datetime.now() - STARTED_AT
     print(f"[execution time: {duration}]")
 
-def file_contents(filepath, strip_empty_lines=True):
-    empty_lines = not strip_empty_lines
-    with open(filepath, "r") as fh:
-        lines = [l.strip() for l in fh if (empty_lines or l.strip())]
-    return lines
-
-
-def parse_file(filepath):
-    lines = file_contents(filepath, strip_empty_lines=False)
-    things = []
-    turns = None
-    board_lines = []
-    for line in lines:
-        if not turns:
-            turns = line.strip().split(',')
-            continue
-
-        if line.strip() == '':
-            if not board_lines:
-                continue
-            things.append(Board(board_lines))
-            board_lines = []
-        else:
-            board_lines.append(line.strip())
 
-    things.append(Board(board_lines))
-    return (turns,things)
+def parse_file(filepath, engine=ENGINES[0]):
+    # Every engine starts from the same parse
+    if np is not None:
+        return parse_file_bulk(filepath)
+
+    blocks = iter_blocks(filepath)
+    turns = [int(n) for n in next(blocks)[0].split(',')]
+    board_set = None
+    for board_lines in blocks:
+        board_set = add_board_lines(board_set, board_lines)
+    return (turns,board_set)
+
+def parse_file_bulk(filepath):
+    # Memory-maps the input and tokenizes it straight into integer arrays:
+    # the draw order from the first line, then (boards, size, size) values.
+    with mapped(filepath) as mm:
+        data = np.frombuffer(mm, dtype=np.uint8)
+        values, offsets = tokenize_ints(data)
+        del data
+        # Newlines are looked up in the mapping, only two of them matter
+        header_end = mm.find(b"\n")
+        draw_count = int(np.searchsorted(offsets, header_end if header_end >= 0 else len(mm)))
+        # Board size is however many numbers share the first board row's line
+        row_end = mm.find(b"\n", int(offsets[draw_count])) if draw_count < len(offsets) else -1
+        size = int(np.searchsorted(offsets, row_end if row_end >= 0 else len(mm))) - draw_count
+    del offsets
+
+    turns = values[:draw_count].tolist()
+    cells = values[draw_count:]
+    board_set = BoardSet(size)
+    board_set.add_boards(cells.reshape(-1, size, size))
+    return (turns,board_set)
 
+def add_board_lines(board_set, board_lines):
+    rows = [[int(n) for n in re.split(r'\s+', l)] for l in board_lines]
+    if board_set is None:
+        board_set = BoardSet(len(rows))
+    board_set.add_board(rows)
+    return board_set
+
+
+def rank_boards(turns, board_set):
+    # Works out every board's win turn and score from the draw order alone.
+    # A line completes at the latest rank among its cells and a board wins at
+    # its earliest line; boards that never win get len(turns).
+    size = board_set.size
+    values = np.frombuffer(board_set.values, dtype=np.int32).reshape(-1, size, size)
+    draws = np.array(turns, dtype=np.int64)
+    never = len(turns)
+    # Values are looked up among the sorted distinct draws, so memory follows
+    # how many numbers there are rather than how big they get
+    drawn, first_rank = np.unique(draws, return_index=True)
+    ranks = np.full(values.shape, never, dtype=np.int64)
+    if len(drawn):
+        pos = np.minimum(np.searchsorted(drawn, values), len(drawn) - 1)
+        hit = drawn[pos] == values
+        ranks[hit] = first_rank[pos[hit]]
+    lines_done = np.concatenate([ranks.max(axis=2), ranks.max(axis=1)], axis=1)
+    win_turns = lines_done.min(axis=1)
+
+    unmarked = np.where(ranks > win_turns[:, None, None], values, 0).sum(axis=(1, 2), dtype=np.int64)
+    winning_numbers = np.append(draws, 0)[win_turns]
+    return win_turns, unmarked * winning_numbers
+
+def ranked_score(turns, board_set):
+    win_turns, scores = rank_boards(turns, board_set)
+    if not len(win_turns) or win_turns.min() == len(turns):
+        raise Exception("No board wins.")
+    winner = int(np.argmin(win_turns))
+    return int(scores[winner])
+
+def play(turns, board_set):
+    for _, board, _ in board_set.wins(turns):
+        return board
+    raise Exception("No board wins.")
+
+def solve(parsed, engine=ENGINES[0]):
+    turns, board_set = parsed
+    if engine == 'ranked':
+        return ranked_score(turns, board_set)
+    return play(turns, board_set).score
 
 def main(args):
     log_start()
     # ---------
 
-    turns,things = parse_file(args.file)
+    turns,board_set = parse_file(args.file)
 
-    winning_board = None
-
-    for turn in turns:
-        print(f"++++ {turn} ++++")
-        for board in things:
-            if board.check_number(turn):
-                winning_board = board
-                break
+    if args.engine == 'ranked':
+        if np is None:
+            print("Error: The ranked engine requires numpy to be installed.")
+            exit(1)
+        print(f"Score of winning board: {ranked_score(turns, board_set)}")
+        log_end()
+        return
 
-        if winning_board:
-            break
+    if args.top:
+        for n, (i, board, score) in enumerate(itertools.islice(board_set.wins(turns), args.top), 1):
+            print(f"Winner #{n}: board {board.index} on turn {i} ({turns[i]}), score {score}")
+        log_end()
+        return
 
+    winning_board = play(turns, board_set)
     print(f"Score of winning board: {winning_board.score}")
 
     # ---------
@@ -138,8 +287,13 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--part2', default=False, action="store_true", help="Copy part1 to part2")
     parser.add_argument('-f', '--file', help='Input file, default: {}'.format(DEFAULT_INPUT_FILE), default=DEFAULT_INPUT_FILE)
-    parser.add_argument('-v', '--verbose', help="Verbose output", default=False, action="store_true")
+    parser.add_argument('-v', '--verbose', help="Verbose output, repeat for more detail", default=0, action="count")
+    parser.add_argument('--profile', help="Profile main with cProfile and tracemalloc", default=False, action="store_true")
+    parser.add_argument('--no-cache', help="Always recompute instead of replaying a cached result", default=False, action="store_true")
+    parser.add_argument('-e', '--engine', help="Game engine, default: simulate", choices=ENGINES, default=ENGINES[0])
+    parser.add_argument('-k', '--top', help="List the first K winners in order from a single game", type=int)
     args = parser.parse_args()
+    trace.configure(args.verbose)
 
     if args.part2:
         if SCRIPT_PATH.name != "part1.py":
@@ -154,4 +308,7 @@ if __name__ == '__main__':
         print(f"Created {part2}.")
         exit(0)
 
-    main(args)
\ No newline at end of file
+    if args.profile:
+        profile_main(main, args, parse_file, solve, SCRIPT_PATH.with_suffix(".pstats"))
+    else:
+        cached_main(main, args, SCRIPT_PATH)
\ No newline at end of file
@@ -5,15 +5,29 @@ Advent of Code 2021
 """
 
 import argparse
+import sys
 import re
 import math
 import collections
+import struct
+import zlib
 from pathlib import Path
 from shutil import copyfile, copymode
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 SCRIPT_PATH = Path(__file__).resolve()
+sys.path.insert(0, str(SCRIPT_PATH.parents[1]))
+from aoc.reader import iter_lines
+from aoc import trace
+from aoc.cache import cached_main
+from aoc.profiling import profile_main
+
 DEFAULT_INPUT_FILE = SCRIPT_PATH.parent / "input" / SCRIPT_PATH.name.replace(".py", ".txt")
 STARTED_AT = None
 
@@ -32,17 +46,10 @@ def log_end():
     duration = datetime.now() - STARTED_AT
     print(f"[execution time: {duration}]")
 
-def file_contents(filepath, strip_empty_lines=True):
-    empty_lines = not strip_empty_lines
-    with open(filepath, "r") as fh:
-        lines = [l.strip() for l in fh if (empty_lines or l.strip())]
-    return lines
-
 
 def parse_file(filepath):
-    lines = file_contents(filepath)
     things = []
-    for line in lines:
+    for line in iter_lines(filepath):
         # Parse with regex
         mobj = re.match(r'(\d+),(\d+) -> (\d+),(\d+)', line)
         if mobj:
@@ -50,10 +57,211 @@ def parse_file(filepath):
 
     return things
 
-def oceanrange(n1, n2):
-    if n1 > n2:
-        return range(n2, n1+1)
-    return range(n1, n2+1)
+# -- Ocean storage --
+# Cells are saturating counters, anything past this reads as this
+OCEAN_SATURATE = 255
+# A sparse entry costs roughly this many grid bytes, so boxes with fewer than
+# one point per SPARSE_FILL cells go in the sparse store
+SPARSE_FILL = 64
+# Segments averaging at least this many points are worth a numpy call each
+NUMPY_MIN_RUN = 4096
+# Byte translation table that bumps every count by one, saturating at 255
+SATURATING_INC = bytes(range(1, 256)) + b"\xff"
+
+def segment_length(t):
+    return max(abs(t[2] - t[0]), abs(t[3] - t[1])) + 1
+
+def bounding_box(things):
+    # (min_x, min_y, width, height) covering every segment
+    min_x = min(min(t[0], t[2]) for t in things)
+    min_y = min(min(t[1], t[3]) for t in things)
+    width = max(max(t[0], t[2]) for t in things) - min_x + 1
+    height = max(max(t[1], t[3]) for t in things) - min_y + 1
+    return min_x, min_y, width, height
+
+def segment_slice(t, min_x, min_y, width):
+    # A segment is a run of evenly spaced cells in a row-major grid
+    x1, y1, x2, y2 = t
+    dx = (x2 > x1) - (x2 < x1)
+    dy = (y2 > y1) - (y2 < y1)
+    n = segment_length(t) - 1
+    start = (y1 - min_y) * width + (x1 - min_x)
+    step = dy * width + dx
+    if step < 0:
+        start, step = start + n * step, -step
+    step = step or 1
+    return slice(start, start + n * step + 1, step)
+
+def bump_run(cells, span):
+    # Bumps the saturating counters in cells[span], returning how many just
+    # reached 2. Works on a numpy uint8 array, a bytearray or a memoryview.
+    if np is not None and isinstance(cells, np.ndarray):
+        run = cells[span]
+        new_overlaps = int(np.count_nonzero(run == 1))
+        run += run < OCEAN_SATURATE
+        return new_overlaps
+    run = bytes(cells[span])
+    cells[span] = run.translate(SATURATING_INC)
+    return run.count(1)
+
+class ByteOcean:
+    # One byte per cell of the segments' bounding box, row-major
+    kind = "bytes"
+
+    def __init__(self, min_x, min_y, width, height):
+        self.min_x, self.min_y, self.width, self.height = min_x, min_y, width, height
+        self.cells = bytearray(width * height)
+
+    def place_line(self, t):
+        return bump_run(self.cells, segment_slice(t, self.min_x, self.min_y, self.width))
+
+    def row(self, y):
+        start = (y - self.min_y) * self.width
+        return list(self.cells[start:start + self.width])
+
+class NumpyOcean:
+    # Same layout as ByteOcean, each segment is one strided view
+    kind = "numpy"
+
+    def __init__(self, min_x, min_y, width, height):
+        self.min_x, self.min_y, self.width, self.height = min_x, min_y, width, height
+        self.cells = np.zeros(width * height, dtype=np.uint8)
+
+    def place_line(self, t):
+        return bump_run(self.cells, segment_slice(t, self.min_x, self.min_y, self.width))
+
+    def row(self, y):
+        start = (y - self.min_y) * self.width
+        return self.cells[start:start + self.width].tolist()
+
+class SparseOcean:
+    # Only the touched cells, keyed by their index in the bounding box
+    kind = "sparse"
+
+    def __init__(self, min_x, min_y, width, height):
+        self.min_x, self.min_y, self.width, self.height = min_x, min_y, width, height
+        self.cells = {}
+
+    def place_line(self, t):
+        span = segment_slice(t, self.min_x, self.min_y, self.width)
+        cells = self.cells
+        new_overlaps = 0
+        for idx in range(span.start, span.stop, span.step):
+            count = cells.get(idx, 0)
+            if count == 1:
+                new_overlaps += 1
+            if count < OCEAN_SATURATE:
+                cells[idx] = count + 1
+        return new_overlaps
+
+    def row(self, y):
+        start = (y - self.min_y) * self.width
+        return [self.cells.get(idx, 0) for idx in range(start, start + self.width)]
+
+OCEAN_BACKENDS = {
+    'bytes': ByteOcean,
+    'numpy': NumpyOcean,
+    'sparse': SparseOcean,
+}
+
+def choose_backend(things, width, height):
+    cells = width * height
+    points = sum(map(segment_length, things))
+    if points * SPARSE_FILL < cells:
+        return 'sparse'
+    if np is not None and points >= NUMPY_MIN_RUN * len(things):
+        return 'numpy'
+    return 'bytes'
+
+def make_ocean(things, backend='auto'):
+    min_x, min_y, width, height = bounding_box(things) if things else (0, 0, 1, 1)
+    if backend == 'auto':
+        backend = choose_backend(things, width, height)
+    return OCEAN_BACKENDS[backend](min_x, min_y, width, height)
+
+# -- Rendering --
+# Counts at or above this level all render the same
+RENDER_LEVELS = 4
+
+def ocean_rows(ocean, width, height):
+    # The store only covers the bounding box, pad rows back out to the origin
+    left = [0] * ocean.min_x
+    right = [0] * (width - ocean.min_x - ocean.width)
+    for y in range(height):
+        if ocean.min_y <= y < ocean.min_y + ocean.height:
+            yield left + ocean.row(y) + right
+        else:
+            yield [0] * width
+
+def render_pgm(rows, width, height, path):
+    with open(path, "wb") as fh:
+        fh.write(f"P5\n{width} {height}\n{RENDER_LEVELS}\n".encode())
+        for row in rows:
+            fh.write(bytes(min(v, RENDER_LEVELS) for v in row))
+
+def png_chunk(fh, kind, data):
+    fh.write(struct.pack(">I", len(data)))
+    fh.write(kind + data)
+    fh.write(struct.pack(">I", zlib.crc32(kind + data)))
+
+def render_png(rows, width, height, path):
+    scale = 255 // RENDER_LEVELS
+    compressor = zlib.compressobj()
+    with open(path, "wb") as fh:
+        fh.write(b"\x89PNG\r\n\x1a\n")
+        png_chunk(fh, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+        for row in rows:
+            # Each scanline is a filter byte (0 = none) followed by the pixels
+            data = compressor.compress(b"\x00" + bytes(min(v, RENDER_LEVELS) * scale for v in row))
+            if data:
+                png_chunk(fh, b"IDAT", data)
+        png_chunk(fh, b"IDAT", compressor.flush())
+        png_chunk(fh, b"IEND", b"")
+
+def preview_line(counts):
+    return "".join('.' if n == 0 else str(min(n, 9)) for n in counts)
+
+def render_preview(rows, width, columns):
+    # Each preview character shows the busiest cell in its block
+    block = max(1, -(-width // columns))
+    pending = None
+    pending_rows = 0
+    for row in rows:
+        maxes = [max(row[i:i+block]) for i in range(0, width, block)]
+        pending = maxes if pending is None else list(map(max, pending, maxes))
+        pending_rows += 1
+        if pending_rows == block:
+            print(preview_line(pending))
+            pending = None
+            pending_rows = 0
+    if pending:
+        print(preview_line(pending))
+
+def render_ocean(args, ocean, width, height):
+    if args.render:
+        if Path(args.render).suffix.lower() == ".png":
+            render_png(ocean_rows(ocean, width, height), width, height, args.render)
+        else:
+            render_pgm(ocean_rows(ocean, width, height), width, height, args.render)
+        print(f"Rendered ocean to {args.render}.")
+    if args.preview:
+        render_preview(ocean_rows(ocean, width, height), width, args.preview)
+
+def fill_ocean(things, backend='auto'):
+    # Only horizontal and vertical lines count for this part
+    lines = [t for t in things if t[0] == t[2] or t[1] == t[3]]
+    ocean = make_ocean(lines, backend)
+    overlap_count = 0
+    for t in lines:
+        overlap_count += ocean.place_line(t)
+
+    # Rendering still starts at the origin and covers the diagonals too
+    max_x = max((max(t[0], t[2]) for t in things), default=0) + 1
+    max_y = max((max(t[1], t[3]) for t in things), default=0) + 1
+    return ocean, max_x, max_y, overlap_count
+
+def solve(things):
+    return fill_ocean(things)[3]
 
 def main(args):
     log_start()
@@ -61,45 +269,16 @@ def main(args):
 
     things = parse_file(args.file)
 
-    max_x = 0
-    max_y = 0
-    for t in things:
-        biggest_x = max([t[0], t[2]])
-        biggest_y = max([t[1], t[3]])
-        if biggest_x > max_x:
-            max_x = biggest_x
-        if biggest_y > max_y:
-            max_y = biggest_y
-
-    max_x += 1
-    max_y += 1
-
-    print(f"Building an ocean that is {max_x} x {max_y}.")
-    ocean = [['.']*max_x for n in range(max_y)]
+    if args.ocean == 'numpy' and np is None:
+        print("Error: The numpy ocean requires numpy to be installed.")
+        exit(1)
+    ocean, max_x, max_y, overlap_count = fill_ocean(things, args.ocean)
+    info = trace.at(trace.INFO)
+    if info:
+        info("Built a %s ocean that is %d x %d at (%d, %d).", ocean.kind, ocean.width, ocean.height, ocean.min_x, ocean.min_y)
 
-    overlap_count = 0
-    for t in things:
-        if t[0] == t[2]:
-            for i in oceanrange(t[1], t[3]):
-                if ocean[i][t[0]] == '.':
-                    ocean[i][t[0]] = 1
-                else:
-                    ocean[i][t[0]] += 1
-                    if ocean[i][t[0]] == 2:
-                        overlap_count += 1
-        elif t[1] == t[3]:
-            for i in oceanrange(t[0], t[2]):
-                if ocean[t[1]][i] == '.':
-                    ocean[t[1]][i] = 1
-                else:
-                    ocean[t[1]][i] += 1
-                    if ocean[t[1]][i] == 2:
-                        overlap_count += 1
-        else:
-            continue
 
-    for r in ocean:
-        print("".join(map(str,r)))
+    render_ocean(args, ocean, max_x, max_y)
 
     print(f"There are {overlap_count} points of overlap.")
 
@@ -111,8 +290,14 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--part2', default=False, action="store_true", help="Copy part1 to part2")
     parser.add_argument('-f', '--file', help='Input file, default: {}'.format(DEFAULT_INPUT_FILE), default=DEFAULT_INPUT_FILE)
-    parser.add_argument('-v', '--verbose', help="Verbose output", default=False, action="store_true")
+    parser.add_argument('-v', '--verbose', help="Verbose output, repeat for more detail", default=0, action="count")
+    parser.add_argument('--profile', help="Profile main with cProfile and tracemalloc", default=False, action="store_true")
+    parser.add_argument('--no-cache', help="Always recompute instead of replaying a cached result", default=False, action="store_true")
+    parser.add_argument('-r', '--render', help="Write the ocean to an image file (.png, otherwise PGM)")
+    parser.add_argument('-p', '--preview', help="Print a text preview of the ocean downsampled to this many columns", type=int)
+    parser.add_argument('--ocean', help="Ocean storage, default: auto (picked from density and span)", choices=['auto', *OCEAN_BACKENDS], default='auto')
     args = parser.parse_args()
+    trace.configure(args.verbose)
 
     if args.part2:
         if SCRIPT_PATH.name != "part1.py":
@@ -127,4 +312,7 @@ if __name__ == '__main__':
         print(f"Created {part2}.")
         exit(0)
 
-    main(args)
\ No newline at end of file
+    if args.profile:
+        profile_main(main, args, parse_file, solve, SCRIPT_PATH.with_suffix(".pstats"))
+    else:
+        cached_main(main, args, SCRIPT_PATH)
\ No newline at end of file
@@ -5,17 +5,39 @@ Advent of Code 2021
 """
 
 import argparse
+import sys
+import bisect
 import re
 import math
 import collections
+import itertools
+import operator
+import struct
+import zlib
+import concurrent.futures
+import os
+from multiprocessing import shared_memory
 from pathlib import Path
 from shutil import copyfile, copymode
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 SCRIPT_PATH = Path(__file__).resolve()
+sys.path.insert(0, str(SCRIPT_PATH.parents[1]))
+from aoc.reader import iter_lines
+from aoc import trace
+from aoc.cache import cached_main
+from aoc.profiling import profile_main
+
 DEFAULT_INPUT_FILE = SCRIPT_PATH.parent / "input" / SCRIPT_PATH.name.replace(".py", ".txt")
 STARTED_AT = None
+# Engines, the first is the default
+ENGINES = ('grid', 'sparse', 'numpy', 'tiled', 'layered', 'shared')
 
 @dataclass
 class Tile:
@@ -32,17 +54,11 @@ def log_end():
     duration = datetime.now() - STARTED_AT
     print(f"[execution time: {duration}]")
 
-def file_contents(filepath, strip_empty_lines=True):
-    empty_lines = not strip_empty_lines
-    with open(filepath, "r") as fh:
-        lines = [l.strip() for l in fh if (empty_lines or l.strip())]
-    return lines
-
 
-def parse_file(filepath):
-    lines = file_contents(filepath)
+def parse_file(filepath, engine=ENGINES[0]):
+    # Every engine starts from the same parse
     things = []
-    for line in lines:
+    for line in iter_lines(filepath):
         # Parse with regex
         mobj = re.match(r'(\d+),(\d+) -> (\d+),(\d+)', line)
         if mobj:
@@ -50,67 +66,602 @@ def parse_file(filepath):
 
     return things
 
-def line_points(n1, n2):
-    if n1 > n2:
-        r = list(range(n2, n1+1))
-        r.reverse()
-        return r
-    return list(range(n1, n2+1))
-
-def get_line_points(x1, y1, x2, y2):
-    if x1 != x2:
-        x_points = line_points(x1, x2)
-    if y1 != y2:
-        y_points = line_points(y1, y2)
+# -- Ocean storage --
+# Cells are saturating counters, anything past this reads as this
+OCEAN_SATURATE = 255
+# A sparse entry costs roughly this many grid bytes, so boxes with fewer than
+# one point per SPARSE_FILL cells go in the sparse store
+SPARSE_FILL = 64
+# Segments averaging at least this many points are worth a numpy call each
+NUMPY_MIN_RUN = 4096
+# Byte translation table that bumps every count by one, saturating at 255
+SATURATING_INC = bytes(range(1, 256)) + b"\xff"
+
+def segment_length(t):
+    return max(abs(t[2] - t[0]), abs(t[3] - t[1])) + 1
+
+def segment_slice(t, min_x, min_y, width):
+    # A segment is a run of evenly spaced cells in a row-major grid
+    x1, y1, x2, y2 = t
+    dx = (x2 > x1) - (x2 < x1)
+    dy = (y2 > y1) - (y2 < y1)
+    n = segment_length(t) - 1
+    start = (y1 - min_y) * width + (x1 - min_x)
+    step = dy * width + dx
+    if step < 0:
+        start, step = start + n * step, -step
+    step = step or 1
+    return slice(start, start + n * step + 1, step)
+
+def bump_run(cells, span):
+    # Bumps the saturating counters in cells[span], returning how many just
+    # reached 2. Works on a numpy uint8 array, a bytearray or a memoryview.
+    if np is not None and isinstance(cells, np.ndarray):
+        run = cells[span]
+        new_overlaps = int(np.count_nonzero(run == 1))
+        run += run < OCEAN_SATURATE
+        return new_overlaps
+    run = bytes(cells[span])
+    cells[span] = run.translate(SATURATING_INC)
+    return run.count(1)
+
+class ByteOcean:
+    # One byte per cell of the segments' bounding box, row-major
+    kind = "bytes"
+
+    def __init__(self, min_x, min_y, width, height):
+        self.min_x, self.min_y, self.width, self.height = min_x, min_y, width, height
+        self.cells = bytearray(width * height)
+
+    def place_line(self, t):
+        return bump_run(self.cells, segment_slice(t, self.min_x, self.min_y, self.width))
+
+    def row(self, y):
+        start = (y - self.min_y) * self.width
+        return list(self.cells[start:start + self.width])
+
+class NumpyOcean:
+    # Same layout as ByteOcean, each segment is one strided view
+    kind = "numpy"
+
+    def __init__(self, min_x, min_y, width, height):
+        self.min_x, self.min_y, self.width, self.height = min_x, min_y, width, height
+        self.cells = np.zeros(width * height, dtype=np.uint8)
+
+    def place_line(self, t):
+        return bump_run(self.cells, segment_slice(t, self.min_x, self.min_y, self.width))
+
+    def row(self, y):
+        start = (y - self.min_y) * self.width
+        return self.cells[start:start + self.width].tolist()
+
+class SparseOcean:
+    # Only the touched cells, keyed by their index in the bounding box
+    kind = "sparse"
+
+    def __init__(self, min_x, min_y, width, height):
+        self.min_x, self.min_y, self.width, self.height = min_x, min_y, width, height
+        self.cells = {}
+
+    def place_line(self, t):
+        span = segment_slice(t, self.min_x, self.min_y, self.width)
+        cells = self.cells
+        new_overlaps = 0
+        for idx in range(span.start, span.stop, span.step):
+            count = cells.get(idx, 0)
+            if count == 1:
+                new_overlaps += 1
+            if count < OCEAN_SATURATE:
+                cells[idx] = count + 1
+        return new_overlaps
+
+    def row(self, y):
+        start = (y - self.min_y) * self.width
+        return [self.cells.get(idx, 0) for idx in range(start, start + self.width)]
+
+OCEAN_BACKENDS = {
+    'bytes': ByteOcean,
+    'numpy': NumpyOcean,
+    'sparse': SparseOcean,
+}
+
+def choose_backend(things, width, height):
+    cells = width * height
+    points = sum(map(segment_length, things))
+    if points * SPARSE_FILL < cells:
+        return 'sparse'
+    if np is not None and points >= NUMPY_MIN_RUN * len(things):
+        return 'numpy'
+    return 'bytes'
+
+def make_ocean(things, backend='auto'):
+    min_x, min_y, width, height = bounding_box(things) if things else (0, 0, 1, 1)
+    if backend == 'auto':
+        backend = choose_backend(things, width, height)
+    return OCEAN_BACKENDS[backend](min_x, min_y, width, height)
+
+# -- Rendering --
+# Counts at or above this level all render the same
+RENDER_LEVELS = 4
+
+def ocean_rows(ocean, width, height):
+    # The store only covers the bounding box, pad rows back out to the origin
+    left = [0] * ocean.min_x
+    right = [0] * (width - ocean.min_x - ocean.width)
+    for y in range(height):
+        if ocean.min_y <= y < ocean.min_y + ocean.height:
+            yield left + ocean.row(y) + right
+        else:
+            yield [0] * width
+
+def render_pgm(rows, width, height, path):
+    with open(path, "wb") as fh:
+        fh.write(f"P5\n{width} {height}\n{RENDER_LEVELS}\n".encode())
+        for row in rows:
+            fh.write(bytes(min(v, RENDER_LEVELS) for v in row))
+
+def png_chunk(fh, kind, data):
+    fh.write(struct.pack(">I", len(data)))
+    fh.write(kind + data)
+    fh.write(struct.pack(">I", zlib.crc32(kind + data)))
+
+def render_png(rows, width, height, path):
+    scale = 255 // RENDER_LEVELS
+    compressor = zlib.compressobj()
+    with open(path, "wb") as fh:
+        fh.write(b"\x89PNG\r\n\x1a\n")
+        png_chunk(fh, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+        for row in rows:
+            # Each scanline is a filter byte (0 = none) followed by the pixels
+            data = compressor.compress(b"\x00" + bytes(min(v, RENDER_LEVELS) * scale for v in row))
+            if data:
+                png_chunk(fh, b"IDAT", data)
+        png_chunk(fh, b"IDAT", compressor.flush())
+        png_chunk(fh, b"IEND", b"")
+
+def preview_line(counts):
+    return "".join('.' if n == 0 else str(min(n, 9)) for n in counts)
+
+def render_preview(rows, width, columns):
+    # Each preview character shows the busiest cell in its block
+    block = max(1, -(-width // columns))
+    pending = None
+    pending_rows = 0
+    for row in rows:
+        maxes = [max(row[i:i+block]) for i in range(0, width, block)]
+        pending = maxes if pending is None else list(map(max, pending, maxes))
+        pending_rows += 1
+        if pending_rows == block:
+            print(preview_line(pending))
+            pending = None
+            pending_rows = 0
+    if pending:
+        print(preview_line(pending))
+
+def render_ocean(args, ocean, width, height):
+    if args.render:
+        if Path(args.render).suffix.lower() == ".png":
+            render_png(ocean_rows(ocean, width, height), width, height, args.render)
+        else:
+            render_pgm(ocean_rows(ocean, width, height), width, height, args.render)
+        print(f"Rendered ocean to {args.render}.")
+    if args.preview:
+        render_preview(ocean_rows(ocean, width, height), width, args.preview)
+
+# -- Sparse engine --
+# Every vent line sits on one of four line families, each written as a*x + b*y = c.
+LINE_FAMILIES = {
+    'h': (0, 1),
+    'v': (1, 0),
+    'd+': (1, -1),
+    'd-': (1, 1),
+}
+
+def segment_family(x1, y1, x2, y2):
+    if y1 == y2:
+        return 'h'
     if x1 == x2:
-        x_points = [x1]*len(y_points)
+        return 'v'
+    if (x2 - x1) == (y2 - y1):
+        return 'd+'
+    return 'd-'
+
+def segment_line(seg):
+    family, x1, y1 = seg[0], seg[1], seg[2]
+    a, b = LINE_FAMILIES[family]
+    return a, b, a*x1 + b*y1
+
+def segment_span(seg):
+    # Position along the line: y for verticals, x for everything else
+    family, x1, y1, x2, y2 = seg
+    if family == 'v':
+        return min(y1, y2), max(y1, y2)
+    return min(x1, x2), max(x1, x2)
+
+def segment_contains(seg, x, y):
+    _, x1, y1, x2, y2 = seg
+    return min(x1, x2) <= x <= max(x1, x2) and min(y1, y2) <= y <= max(y1, y2)
+
+def segment_intersection(s1, s2):
+    a1, b1, c1 = segment_line(s1)
+    a2, b2, c2 = segment_line(s2)
+    det = a1*b2 - a2*b1
+    x_num = c1*b2 - c2*b1
+    y_num = a1*c2 - a2*c1
+    # Crossing diagonals can meet between grid points
+    if x_num % det or y_num % det:
+        return None
+    x, y = x_num // det, y_num // det
+    if segment_contains(s1, x, y) and segment_contains(s2, x, y):
+        return (x, y)
+    return None
+
+def segment_cells(seg, cell_size):
+    _, x1, y1, x2, y2 = seg
+    dx = (x2 > x1) - (x2 < x1)
+    dy = (y2 > y1) - (y2 < y1)
+    length = max(abs(x2 - x1), abs(y2 - y1))
+    t = 0
+    while t <= length:
+        x = x1 + dx*t
+        y = y1 + dy*t
+        yield (x // cell_size, y // cell_size)
+        # Jump straight to the next point that lands in a different cell
+        step = length + 1
+        if dx > 0:
+            step = min(step, cell_size - x % cell_size)
+        elif dx < 0:
+            step = min(step, x % cell_size + 1)
+        if dy > 0:
+            step = min(step, cell_size - y % cell_size)
+        elif dy < 0:
+            step = min(step, y % cell_size + 1)
+        t += step
+
+def merge_overlap_ranges(spans):
+    # Ranges along one line covered by at least two of its segments
+    overlaps = []
+    reach = None
+    for lo, hi in sorted(spans):
+        if reach is not None and lo <= reach:
+            top = min(hi, reach)
+            if overlaps and lo <= overlaps[-1][1] + 1:
+                overlaps[-1][1] = max(overlaps[-1][1], top)
+            else:
+                overlaps.append([lo, top])
+        if reach is None or hi > reach:
+            reach = hi
+    return overlaps
+
+def in_ranges(ranges, n):
+    if not ranges:
+        return False
+    i = bisect.bisect_right(ranges, [n, math.inf]) - 1
+    return i >= 0 and ranges[i][0] <= n <= ranges[i][1]
+
+def default_cell_size(segments):
+    min_x = min(min(s[1], s[3]) for s in segments)
+    max_x = max(max(s[1], s[3]) for s in segments)
+    min_y = min(min(s[2], s[4]) for s in segments)
+    max_y = max(max(s[2], s[4]) for s in segments)
+    area = (max_x - min_x + 1) * (max_y - min_y + 1)
+    return max(1, math.isqrt(area // len(segments)))
+
+def count_overlaps_sparse(things, cell_size=None):
+    segments = [(segment_family(*t), *t) for t in things]
+    if not segments:
+        return 0
+    if cell_size is None:
+        cell_size = default_cell_size(segments)
+
+    # Collinear overlaps: group by line and sweep the spans
+    lines = collections.defaultdict(list)
+    for seg in segments:
+        lines[segment_line(seg)].append(segment_span(seg))
+
+    collinear = {}
+    overlap_count = 0
+    for line, spans in lines.items():
+        if len(spans) < 2:
+            continue
+        ranges = merge_overlap_ranges(spans)
+        if ranges:
+            collinear[line] = ranges
+            overlap_count += sum(hi - lo + 1 for lo, hi in ranges)
+
+    # Crossings: only segments sharing a cell can meet, and each point is
+    # claimed by the single cell it falls in.
+    cells = collections.defaultdict(lambda: collections.defaultdict(list))
+    for seg in segments:
+        for cell in segment_cells(seg, cell_size):
+            cells[cell][seg[0]].append(seg)
+
+    crossings = set()
+    for (cx, cy), by_family in cells.items():
+        families = list(by_family)
+        for i, f1 in enumerate(families):
+            for f2 in families[i+1:]:
+                for s1 in by_family[f1]:
+                    for s2 in by_family[f2]:
+                        point = segment_intersection(s1, s2)
+                        if point and point[0] // cell_size == cx and point[1] // cell_size == cy:
+                            crossings.add(point)
+
+    # A crossing may already sit inside collinear overlaps, possibly on more
+    # than one line, so make sure each point ends up counted exactly once.
+    for x, y in crossings:
+        counted = 0
+        for a, b in LINE_FAMILIES.values():
+            line = (a, b, a*x + b*y)
+            if line in collinear and in_ranges(collinear[line], y if a and not b else x):
+                counted += 1
+        overlap_count += 1 - counted
+
+    return overlap_count
+
+# -- NumPy engine --
+# Cap on points rasterized per batch, keeps the index arrays bounded
+NUMPY_BATCH_POINTS = 1 << 18
+
+def rasterize_segments(segs, min_x, min_y, width):
+    # Flat grid index of every point on every segment, no Python loop per point
+    x1, y1, x2, y2 = (segs[:, i] for i in range(4))
+    sx = np.sign(x2 - x1)
+    sy = np.sign(y2 - y1)
+    lengths = np.maximum(np.abs(x2 - x1), np.abs(y2 - y1)) + 1
+    starts = np.cumsum(lengths) - lengths
+    t = np.arange(lengths.sum()) - np.repeat(starts, lengths)
+    xs = np.repeat(x1 - min_x, lengths) + np.repeat(sx, lengths) * t
+    ys = np.repeat(y1 - min_y, lengths) + np.repeat(sy, lengths) * t
+    return ys * width + xs
+
+def bounding_box(things):
+    # (min_x, min_y, width, height) covering every segment
+    min_x = min(min(t[0], t[2]) for t in things)
+    min_y = min(min(t[1], t[3]) for t in things)
+    width = max(max(t[0], t[2]) for t in things) - min_x + 1
+    height = max(max(t[1], t[3]) for t in things) - min_y + 1
+    return min_x, min_y, width, height
+
+def coverage_numpy(segs, min_x, min_y, width, size, batch_points=NUMPY_BATCH_POINTS):
+    # Only "seen once" vs "seen twice or more" matters, so saturate at 2
+    grid = np.zeros(size, dtype=np.uint8)
+    lengths = np.maximum(np.abs(segs[:, 2] - segs[:, 0]), np.abs(segs[:, 3] - segs[:, 1])) + 1
+    batch_ids = np.cumsum(lengths) // batch_points
+    bounds = np.flatnonzero(np.diff(batch_ids)) + 1
+    for batch in np.split(segs, bounds):
+        # Scatter into just the touched cells, a full-grid bincount per batch
+        # would cost 8 bytes for every cell of the box
+        cells, hits = np.unique(rasterize_segments(batch, min_x, min_y, width), return_counts=True)
+        grid[cells] = np.minimum(grid[cells] + np.minimum(hits, 2), 2)
+    return grid
+
+def count_overlaps_numpy(things, batch_points=NUMPY_BATCH_POINTS):
+    if not things:
+        return 0
+    min_x, min_y, width, height = bounding_box(things)
+    segs = np.array(things, dtype=np.int64)
+    grid = coverage_numpy(segs, min_x, min_y, width, width * height, batch_points)
+    return int(np.count_nonzero(grid == 2))
+
+# -- Layered engine --
+def is_axis_aligned(t):
+    return t[0] == t[2] or t[1] == t[3]
+
+def coverage_layers_bytes(things, min_x, min_y, width, size):
+    # Pure Python fallback: walk each segment once into its own layer
+    axis = bytearray(size)
+    diag = bytearray(size)
+    for x1, y1, x2, y2 in things:
+        layer = axis if x1 == x2 or y1 == y2 else diag
+        dx = (x2 > x1) - (x2 < x1)
+        dy = (y2 > y1) - (y2 < y1)
+        idx = (y1 - min_y) * width + (x1 - min_x)
+        step = dy * width + dx
+        for _ in range(max(abs(x2 - x1), abs(y2 - y1)) + 1):
+            if layer[idx] < 2:
+                layer[idx] += 1
+            idx += step
+    return axis, diag
+
+def count_overlaps_layered(things):
+    # Both answers from one parse and one pass over the segments: axis-aligned
+    # and diagonal coverage are kept in separate layers (saturating at 2), part1
+    # only looks at the axis layer and part2 at the two layers combined.
+    if not things:
+        return 0, 0
+    min_x, min_y, width, height = bounding_box(things)
+    size = width * height
+
+    if np is not None:
+        segs = np.array(things, dtype=np.int64)
+        axis_rows = (segs[:, 0] == segs[:, 2]) | (segs[:, 1] == segs[:, 3])
+        axis = coverage_numpy(segs[axis_rows], min_x, min_y, width, size)
+        diag = coverage_numpy(segs[~axis_rows], min_x, min_y, width, size)
+        axis_only = int(np.count_nonzero(axis == 2))
+        diag += axis
+        combined = int(np.count_nonzero(diag >= 2))
+        return axis_only, combined
+
+    axis, diag = coverage_layers_bytes(things, min_x, min_y, width, size)
+    both = bytes(map(operator.add, axis, diag))
+    axis_only = size - axis.count(0) - axis.count(1)
+    combined = size - both.count(0) - both.count(1)
+    return axis_only, combined
+
+# -- Tiled engine --
+DEFAULT_TILE_SIZE = 1024
+
+def clip_segment(t, x0, y0, x1, y1):
+    # Clip a segment to the tile [x0, x1] x [y0, y1], None if it misses
+    sx1, sy1, sx2, sy2 = t
+    dx = (sx2 > sx1) - (sx2 < sx1)
+    dy = (sy2 > sy1) - (sy2 < sy1)
+    lo, hi = 0, max(abs(sx2 - sx1), abs(sy2 - sy1))
+    for start, step, low, high in ((sx1, dx, x0, x1), (sy1, dy, y0, y1)):
+        if step > 0:
+            lo, hi = max(lo, low - start), min(hi, high - start)
+        elif step < 0:
+            lo, hi = max(lo, start - high), min(hi, start - low)
+        elif not low <= start <= high:
+            return None
+    if lo > hi:
+        return None
+    return [sx1 + dx*lo, sy1 + dy*lo, sx1 + dx*hi, sy1 + dy*hi]
+
+# Each task takes a block of TILE_BLOCK x TILE_BLOCK tiles and splits it up
+# itself, so the parent never walks every tile of a wide, sparse map
+TILE_BLOCK = 64
+# Tiles with more segments than this are worth a numpy grid
+TILE_SPARSE_SEGMENTS = 8
+
+def split_into_tiles(things, tile_size):
+    # Only tiles touched by two or more segments can hold an overlap, so
+    # count first and clip just those. On a sparse map most tiles hold one.
+    touches = collections.Counter()
+    for t in things:
+        touches.update(segment_tiles(t, tile_size))
+    tiles = collections.defaultdict(list)
+    for t in things:
+        for tile in segment_tiles(t, tile_size):
+            if touches[tile] > 1:
+                x0, y0 = tile[0] * tile_size, tile[1] * tile_size
+                tiles[tile].append(clip_segment(t, x0, y0, x0 + tile_size - 1, y0 + tile_size - 1))
+    return tiles
+
+def segment_tiles(t, tile_size):
+    x1, y1, x2, y2 = t
+    # Straight lines walk a plain range of tiles
     if y1 == y2:
-        y_points = [y1]*len(x_points)
-    points = []
-    for i in range(len(x_points)):
-        points.append([x_points[i], y_points[i]])
-    return points
-
-def place_line(ocean, points):
-    new_overlaps = 0
-    for x,y in get_line_points(*points):
-        if ocean[y][x] == '.':
-            ocean[y][x] = 1
-        else:
-            ocean[y][x] += 1
-            if ocean[y][x] == 2:
-                new_overlaps += 1
-    return new_overlaps
+        return zip(range(min(x1, x2) // tile_size, max(x1, x2) // tile_size + 1), itertools.repeat(y1 // tile_size))
+    if x1 == x2:
+        return zip(itertools.repeat(x1 // tile_size), range(min(y1, y2) // tile_size, max(y1, y2) // tile_size + 1))
+    return segment_cells((None, *t), tile_size)
 
-def main(args):
-    log_start()
-    # ---------
+def count_tile_overlaps(segs):
+    # Every point belongs to exactly one tile, so tile counts simply add up
+    if np is not None and len(segs) > TILE_SPARSE_SEGMENTS:
+        return count_overlaps_numpy(segs)
+    return count_overlaps_sparse(segs)
 
-    things = parse_file(args.file)
+def count_block_overlaps(segs, tile_size):
+    return sum(map(count_tile_overlaps, split_into_tiles(segs, tile_size).values()))
+
+def count_overlaps_tiled(things, tile_size=DEFAULT_TILE_SIZE, workers=None):
+    blocks = split_into_tiles(things, tile_size * TILE_BLOCK)
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(blocks) // (workers * 4))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(count_block_overlaps, blocks.values(), itertools.repeat(tile_size), chunksize=chunksize))
+
+# -- Shared-memory engine --
+# Bands per worker, so a slow band doesn't leave the other workers idle
+BANDS_PER_WORKER = 4
 
-    max_x = 0
-    max_y = 0
+def split_into_bands(things, min_x, min_y, width, height, bands):
+    # Clip every segment to the horizontal bands of rows it crosses
+    band_height = -(-height // bands)
+    band_segs = [[] for _ in range(-(-height // band_height))]
     for t in things:
-        biggest_x = max([t[0], t[2]])
-        biggest_y = max([t[1], t[3]])
-        if biggest_x > max_x:
-            max_x = biggest_x
-        if biggest_y > max_y:
-            max_y = biggest_y
+        lo = (min(t[1], t[3]) - min_y) // band_height
+        hi = (max(t[1], t[3]) - min_y) // band_height
+        for band in range(lo, hi + 1):
+            y0 = min_y + band * band_height
+            band_segs[band].append(clip_segment(t, min_x, y0, min_x + width - 1, y0 + band_height - 1))
+    return band_segs
 
-    max_x += 1
-    max_y += 1
+def place_band(buf, min_x, min_y, width, segs):
+    cells = np.frombuffer(buf, dtype=np.uint8) if np is not None else buf
+    return sum(bump_run(cells, segment_slice(t, min_x, min_y, width)) for t in segs)
 
-    print(f"Building an ocean that is {max_x} x {max_y}.")
-    ocean = [['.']*max_x for n in range(max_y)]
+def rasterize_band(shm_name, min_x, min_y, width, size, segs):
+    # Runs in a worker: only cells inside this band are written, and no other
+    # worker touches them, so the shared grid needs no locking
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        with shm.buf[:size] as buf:
+            return place_band(buf, min_x, min_y, width, segs)
+    finally:
+        shm.close()
 
+def count_overlaps_shared(things, workers=None):
+    # Rasterize row bands in parallel straight into one shared grid, only the
+    # per-band overlap counts travel back
+    if not things:
+        return 0
+    workers = workers or os.cpu_count() or 1
+    min_x, min_y, width, height = bounding_box(things)
+    band_segs = split_into_bands(things, min_x, min_y, width, height, min(height, workers * BANDS_PER_WORKER))
+    size = width * height
+    # A new shared memory block starts out zeroed
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(rasterize_band, shm.name, min_x, min_y, width, size, segs) for segs in band_segs if segs]
+            return sum(f.result() for f in futures)
+    finally:
+        shm.close()
+        shm.unlink()
+
+def fill_ocean(things, backend='auto'):
+    ocean = make_ocean(things, backend)
     overlap_count = 0
     for t in things:
-        overlapped = place_line(ocean, t)
-        overlap_count += overlapped
+        overlap_count += ocean.place_line(t)
+
+    # Rendering still starts at the origin
+    return ocean, ocean.min_x + ocean.width, ocean.min_y + ocean.height, overlap_count
+
+def solve(things, engine=ENGINES[0]):
+    if engine == 'sparse':
+        return count_overlaps_sparse(things)
+    if engine == 'numpy':
+        return count_overlaps_numpy(things)
+    if engine == 'tiled':
+        return count_overlaps_tiled(things)
+    if engine == 'layered':
+        return count_overlaps_layered(things)[1]
+    if engine == 'shared':
+        return count_overlaps_shared(things)
+    return fill_ocean(things)[3]
+
+def main(args):
+    log_start()
+    # ---------
+
+    things = parse_file(args.file)
+
+    if args.engine != 'grid':
+        if args.render or args.preview:
+            print("Error: Rendering is only available with the grid engine.")
+            exit(1)
+        if args.engine == 'numpy':
+            if np is None:
+                print("Error: The numpy engine requires numpy to be installed.")
+                exit(1)
+            overlap_count = count_overlaps_numpy(things)
+        elif args.engine == 'tiled':
+            overlap_count = count_overlaps_tiled(things, args.tile_size, args.workers)
+        elif args.engine == 'shared':
+            overlap_count = count_overlaps_shared(things, args.workers)
+        elif args.engine == 'layered':
+            axis_only, overlap_count = count_overlaps_layered(things)
+            print(f"There are {axis_only} points of overlap from horizontal and vertical lines alone.")
+        else:
+            overlap_count = count_overlaps_sparse(things)
+        print(f"There are {overlap_count} points of overlap.")
+        log_end()
+        return
+
+    if args.ocean == 'numpy' and np is None:
+        print("Error: The numpy ocean requires numpy to be installed.")
+        exit(1)
+    ocean, max_x, max_y, overlap_count = fill_ocean(things, args.ocean)
+    info = trace.at(trace.INFO)
+    if info:
+        info("Built a %s ocean that is %d x %d at (%d, %d).", ocean.kind, ocean.width, ocean.height, ocean.min_x, ocean.min_y)
 
-    for r in ocean:
-        print("".join(map(str,r)))
+    render_ocean(args, ocean, max_x, max_y)
 
     print(f"There are {overlap_count} points of overlap.")
 
@@ -122,8 +673,17 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--part2', default=False, action="store_true", help="Copy part1 to part2")
     parser.add_argument('-f', '--file', help='Input file, default: {}'.format(DEFAULT_INPUT_FILE), default=DEFAULT_INPUT_FILE)
-    parser.add_argument('-v', '--verbose', help="Verbose output", default=False, action="store_true")
+    parser.add_argument('-v', '--verbose', help="Verbose output, repeat for more detail", default=0, action="count")
+    parser.add_argument('--profile', help="Profile main with cProfile and tracemalloc", default=False, action="store_true")
+    parser.add_argument('--no-cache', help="Always recompute instead of replaying a cached result", default=False, action="store_true")
+    parser.add_argument('-r', '--render', help="Write the ocean to an image file (.png, otherwise PGM)")
+    parser.add_argument('-p', '--preview', help="Print a text preview of the ocean downsampled to this many columns", type=int)
+    parser.add_argument('-e', '--engine', help="Overlap engine, default: grid", choices=ENGINES, default=ENGINES[0])
+    parser.add_argument('--ocean', help="Ocean storage for the grid engine, default: auto (picked from density and span)", choices=['auto', *OCEAN_BACKENDS], default='auto')
+    parser.add_argument('--tile-size', help=f"Tile edge length for the tiled engine, default: {DEFAULT_TILE_SIZE}", type=int, default=DEFAULT_TILE_SIZE)
+    parser.add_argument('--workers', help="Worker processes for the tiled and shared engines, default: one per CPU", type=int)
     args = parser.parse_args()
+    trace.configure(args.verbose)
 
     if args.part2:
         if SCRIPT_PATH.name != "part1.py":
@@ -138,4 +698,7 @@ if __name__ == '__main__':
         print(f"Created {part2}.")
         exit(0)
 
-    main(args)
\ No newline at end of file
+    if args.profile:
+        profile_main(main, args, parse_file, solve, SCRIPT_PATH.with_suffix(".pstats"))
+    else:
+        cached_main(main, args, SCRIPT_PATH)
\ No newline at end of file
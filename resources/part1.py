@@ -5,6 +5,7 @@ Advent of Code 2021
 """
 
 import argparse
+import sys
 import re
 import math
 import collections
@@ -14,6 +15,12 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta
 
 SCRIPT_PATH = Path(__file__).resolve()
+sys.path.insert(0, str(SCRIPT_PATH.parents[1]))
+from aoc.reader import iter_lines
+from aoc import trace
+from aoc.cache import cached_main
+from aoc.profiling import profile_main
+
 DEFAULT_INPUT_FILE = SCRIPT_PATH.parent / "input" / SCRIPT_PATH.name.replace(".py", ".txt")
 STARTED_AT = None
 
@@ -32,33 +39,32 @@ def log_end():
     duration = datetime.now() - STARTED_AT
     print(f"[execution time: {duration}]")
 
-def file_contents(filepath, strip_empty_lines=True):
-    empty_lines = not strip_empty_lines
-    with open(filepath, "r") as fh:
-        lines = [l.strip() for l in fh if (empty_lines or l.strip())]
-    return lines
-
 
 def parse_file(filepath):
-    lines = file_contents(filepath)
+    debug = trace.at(trace.DEBUG)
     things = []
-    for line in lines:
+    for line in iter_lines(filepath):
         # Parse with regex
         mobj = re.match(r'', line)
-        if mobj:
-            print(mobj)
+        if mobj and debug:
+            debug("%s", mobj)
 
     return things
 
+def solve(things):
+    for t in things:
+        print(t)
+
+    return None
+
 
 def main(args):
     log_start()
     # ---------
 
     things = parse_file(args.file)
-
-    for t in things:
-        print(t)
+    answer = solve(things)
+    print(f"Answer: {answer}")
 
     # ---------
     log_end()
@@ -68,8 +74,11 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--part2', default=False, action="store_true", help="Copy part1 to part2")
     parser.add_argument('-f', '--file', help='Input file, default: {}'.format(DEFAULT_INPUT_FILE), default=DEFAULT_INPUT_FILE)
-    parser.add_argument('-v', '--verbose', help="Verbose output", default=False, action="store_true")
+    parser.add_argument('-v', '--verbose', help="Verbose output, repeat for more detail", default=0, action="count")
+    parser.add_argument('--profile', help="Profile main with cProfile and tracemalloc", default=False, action="store_true")
+    parser.add_argument('--no-cache', help="Always recompute instead of replaying a cached result", default=False, action="store_true")
     args = parser.parse_args()
+    trace.configure(args.verbose)
 
     if args.part2:
         if SCRIPT_PATH.name != "part1.py":
@@ -84,4 +93,7 @@ if __name__ == '__main__':
         print(f"Created {part2}.")
         exit(0)
 
-    main(args)
\ No newline at end of file
+    if args.profile:
+        profile_main(main, args, parse_file, solve, SCRIPT_PATH.with_suffix(".pstats"))
+    else:
+        cached_main(main, args, SCRIPT_PATH)
\ No newline at end of file